@@ -7,15 +7,69 @@ Returns: HTTP response с токеном или ошибкой
 
 import json
 import os
+import re
 import jwt
 from datetime import datetime, timedelta
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
-def get_db_connection():
+# Реплики для чтения (через запятую); без них всё читается с основного сервера
+REPLICA_DSNS = [dsn.strip() for dsn in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if dsn.strip()]
+REPLICA_MAX_LAG_SECONDS = float(os.environ.get('REPLICA_MAX_LAG_SECONDS', '5'))
+
+# Формат pg_lsn: две шестнадцатеричные половины через "/"; заголовок другого вида
+# игнорируется, иначе приведение ::pg_lsn падало бы на каждой проверке реплики
+LSN_PATTERN = re.compile(r'^[0-9A-Fa-f]{1,8}/[0-9A-Fa-f]{1,8}$')
+
+def get_db_connection(dsn: Optional[str] = None):
     import psycopg2
-    dsn = os.environ.get('DATABASE_URL')
+    dsn = dsn or os.environ.get('DATABASE_URL')
     return psycopg2.connect(dsn)
 
+def replica_is_fresh(conn, min_lsn: Optional[str]) -> bool:
+    cur = conn.cursor()
+    # Весь полученный WAL применён — отставание равно давности последнего сообщения
+    # от основного сервера (он шлёт keepalive и при простое). Иначе — давности
+    # последней применённой транзакции. Реплика без потоковой репликации не годится:
+    # у отключённого приёмника полученный и применённый WAL тоже совпадают.
+    # Статус приёмника виден только с ролью pg_read_all_stats (pg_monitor), без неё
+    # он NULL и чтение уходит на основной сервер
+    cur.execute("""
+        SELECT pg_is_in_recovery(),
+               COALESCE(w.status = 'streaming', FALSE),
+               CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn()
+                    THEN EXTRACT(EPOCH FROM now() - w.last_msg_receipt_time)
+                    ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+               END,
+               %s::pg_lsn IS NULL OR pg_last_wal_replay_lsn() >= %s::pg_lsn
+        FROM (SELECT 1) AS one
+        LEFT JOIN pg_stat_wal_receiver w ON TRUE
+    """, (min_lsn, min_lsn))
+    in_recovery, streaming, lag, caught_up = cur.fetchone()
+    cur.close()
+    return bool(in_recovery and streaming and lag is not None
+                and lag <= REPLICA_MAX_LAG_SECONDS and caught_up)
+
+def get_min_lsn(headers: Dict[str, str]) -> Optional[str]:
+    value = (headers.get('x-min-lsn') or headers.get('X-Min-LSN') or '').strip()
+    return value if LSN_PATTERN.match(value) else None
+
+def get_read_connection(min_lsn: Optional[str] = None):
+    import psycopg2
+    
+    # Реплика подходит, если она жива, не отстаёт и уже видит последнюю запись клиента
+    for dsn in REPLICA_DSNS:
+        try:
+            conn = get_db_connection(dsn)
+        except psycopg2.Error:
+            continue
+        try:
+            if replica_is_fresh(conn, min_lsn):
+                return conn
+        except psycopg2.Error:
+            pass
+        conn.close()
+    return get_db_connection()
+
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     method: str = event.get('httpMethod', 'GET')
     
@@ -25,7 +79,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'headers': {
                 'Access-Control-Allow-Origin': '*',
                 'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-Auth-Token',
+                'Access-Control-Allow-Headers': 'Content-Type, X-Auth-Token, X-Min-LSN',
                 'Access-Control-Max-Age': '86400'
             },
             'body': ''
@@ -128,7 +182,7 @@ def handle_verify(headers: Dict[str, str]) -> Dict[str, Any]:
     try:
         payload = jwt.decode(token, jwt_secret, algorithms=['HS256'])
         
-        conn = get_db_connection()
+        conn = get_read_connection(get_min_lsn(headers))
         cur = conn.cursor()
         
         user_id = int(payload['user_id'])
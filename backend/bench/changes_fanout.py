@@ -0,0 +1,103 @@
+"""
+Бенчмарк рассылки изменений ожидающим клиентам (GET action=changes в events/index.py).
+
+Запускает заданное число одновременных long-poll запросов в одном процессе —
+так выглядит один контейнер функции с соответствующей параллельностью. Когда
+все клиенты ждут, отдельное соединение меняет тестовое событие и фиксирует
+время коммита. Для каждого клиента измеряется задержка от коммита до ответа с
+id события. Дополнительно выводится, сколько запросов к журналу сделал общий
+слушатель (ChangeHub.refreshes) за все раунды: он не зависит от числа клиентов.
+
+Запуск: DATABASE_URL=... python backend/bench/changes_fanout.py [клиентов] [раундов]
+"""
+
+import json
+import statistics
+import sys
+import threading
+import time
+
+from common import BENCH_PREFIX, cleanup_events, connect, load_function, seed_events
+
+events_fn = load_function('events')
+hub = events_fn._change_hub
+
+
+def percentile(ordered, fraction: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run_round(waiters: int, cursor: str, conn, event_id: int):
+    woke = []
+    lock = threading.Lock()
+    next_cursor = []
+
+    def waiter():
+        response = events_fn.handle_wait_changes({'cursor': cursor})
+        finished = time.perf_counter()
+        result = json.loads(response['body'])
+        with lock:
+            if str(event_id) in result.get('ids', []):
+                woke.append(finished)
+            next_cursor.append(result.get('cursor'))
+
+    threads = [threading.Thread(target=waiter) for _ in range(waiters)]
+    for thread in threads:
+        thread.start()
+
+    # Изменение делается только когда все клиенты действительно ждут в хабе
+    deadline = time.monotonic() + 10
+    while hub.waiters < waiters and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    cur = conn.cursor()
+    cur.execute("UPDATE events SET description = %s WHERE id = %s", (str(time.time()), event_id))
+    conn.commit()
+    committed = time.perf_counter()
+    cur.close()
+
+    for thread in threads:
+        thread.join()
+
+    latencies = [(finished - committed) * 1000 for finished in woke]
+    return latencies, max(next_cursor, key=int)
+
+
+def main() -> None:
+    waiters = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    conn = connect()
+    cleanup_events(conn)
+    seed_events(conn, 1, responsible_per_event=0, reminders_per_event=0)
+
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT id FROM events WHERE title LIKE %s", (BENCH_PREFIX + '%',))
+        event_id = cur.fetchone()[0]
+        cur.close()
+
+        cursor = json.loads(events_fn.handle_wait_changes({})['body'])['cursor']
+        refreshes_before = hub.refreshes
+        latencies = []
+        missed = 0
+
+        for _ in range(rounds):
+            round_latencies, cursor = run_round(waiters, cursor, conn, event_id)
+            missed += waiters - len(round_latencies)
+            latencies.extend(round_latencies)
+
+        ordered = sorted(latencies)
+        print(f'Waiters: {waiters}, rounds: {rounds}, woken: {len(ordered)}, missed: {missed}')
+        if ordered:
+            print(f'Commit-to-response latency: p50={statistics.median(ordered):8.2f} ms  '
+                  f'p99={percentile(ordered, 0.99):8.2f} ms  max={ordered[-1]:8.2f} ms')
+        print(f'Hub journal queries: {hub.refreshes - refreshes_before} '
+              f'({(hub.refreshes - refreshes_before) / rounds:.1f} per change, independent of waiters)')
+    finally:
+        cleanup_events(conn)
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Общие помощники бенчмарков: подключение к DATABASE_URL, загрузка кода функций
+и тестовые события. Все тестовые события помечаются префиксом BENCH_PREFIX
+в названии и удаляются через cleanup_events().
+"""
+
+import importlib.util
+import os
+import statistics
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+import psycopg2
+
+BENCH_PREFIX = 'bench:'
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def connect():
+    dsn = os.environ.get('DATABASE_URL')
+    if not dsn:
+        sys.exit('DATABASE_URL is not set')
+    return psycopg2.connect(dsn)
+
+
+def load_function(name: str):
+    path = os.path.join(BACKEND_DIR, name, 'index.py')
+    spec = importlib.util.spec_from_file_location(f'{name}_index', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def bench_admin(cur) -> Dict[str, Any]:
+    cur.execute("SELECT id FROM users WHERE role = 'admin' ORDER BY id LIMIT 1")
+    row = cur.fetchone()
+    if not row:
+        sys.exit('No admin user found')
+    return {'user_id': row[0], 'role': 'admin'}
+
+
+def seed_events(conn, count: int, responsible_per_event: int = 2, reminders_per_event: int = 1) -> None:
+    # Вставка одним оператором на таблицу: подготовка не должна занимать больше, чем сам замер
+    cur = conn.cursor()
+    admin = bench_admin(cur)
+    cur.execute("""
+        INSERT INTO events (title, type, date, time, end_time, status, location, created_by)
+        SELECT %s || g, 'meeting', CURRENT_DATE + (g %% 30), '10:00', '11:00',
+               'scheduled', 'Кабинет ' || (g %% 50), %s
+        FROM generate_series(1, %s) AS g
+    """, (BENCH_PREFIX, admin['user_id'], count))
+    cur.execute("""
+        INSERT INTO event_responsible (event_id, user_id)
+        SELECT e.id, u.id
+        FROM events e
+        CROSS JOIN LATERAL (SELECT id FROM users ORDER BY id LIMIT %s) u
+        WHERE e.title LIKE %s
+    """, (responsible_per_event, BENCH_PREFIX + '%'))
+    cur.execute("""
+        INSERT INTO event_reminders (event_id, reminder_text)
+        SELECT e.id, 'Напоминание ' || r
+        FROM events e, generate_series(1, %s) AS r
+        WHERE e.title LIKE %s
+    """, (reminders_per_event, BENCH_PREFIX + '%'))
+    conn.commit()
+    cur.execute("ANALYZE events")
+    cur.execute("ANALYZE event_responsible")
+    cur.execute("ANALYZE event_reminders")
+    conn.commit()
+    cur.close()
+
+
+def cleanup_events(conn) -> None:
+    cur = conn.cursor()
+    cur.execute("DELETE FROM events WHERE title LIKE %s", (BENCH_PREFIX + '%',))
+    conn.commit()
+    cur.close()
+
+
+def timed(fn: Callable[[], Any], repeat: int) -> List[float]:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def report(label: str, samples_ms: List[float]) -> None:
+    ordered = sorted(samples_ms)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    print(f'{label:<40} n={len(ordered):<6} mean={statistics.mean(ordered):8.3f} ms  '
+          f'p50={statistics.median(ordered):8.3f} ms  p95={p95:8.3f} ms')
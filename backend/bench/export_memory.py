@@ -0,0 +1,76 @@
+"""
+Бенчмарк памяти экспорта событий (GET action=export в events/index.py).
+
+Создаёт заданное число тестовых событий и выгружает их целиком постранично,
+как это делает клиент: каждая следующая страница запрашивается с
+after=X-Export-Next. Для каждой страницы фиксируется пик памяти Python
+(tracemalloc), в конце — максимальный RSS процесса. При серверном курсоре пик
+на страницу ограничен размером страницы и не растёт с общим числом строк.
+
+Запуск: DATABASE_URL=... python backend/bench/export_memory.py [событий] [ndjson|csv]
+"""
+
+import resource
+import sys
+import time
+import tracemalloc
+
+from common import bench_admin, cleanup_events, connect, load_function, seed_events
+
+events_fn = load_function('events')
+
+
+def rss_mb() -> float:
+    # ru_maxrss в Linux измеряется в килобайтах
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main() -> None:
+    event_count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    export_format = sys.argv[2] if len(sys.argv) > 2 else 'ndjson'
+
+    conn = connect()
+    cleanup_events(conn)
+    started = time.perf_counter()
+    seed_events(conn, event_count)
+    print(f'Events seeded: {event_count} ({time.perf_counter() - started:.1f} s)')
+
+    cur = conn.cursor()
+    admin = bench_admin(cur)
+    cur.close()
+
+    try:
+        rss_before = rss_mb()
+        tracemalloc.start()
+        page_peaks = []
+        exported_bytes = 0
+        after = '0'
+        started = time.perf_counter()
+
+        while after is not None:
+            tracemalloc.reset_peak()
+            response = events_fn.handle_export_events(
+                {'format': export_format, 'scope': 'all', 'after': after}, admin
+            )
+            if response['statusCode'] != 200:
+                sys.exit(f'Export failed: {response["body"]}')
+            exported_bytes += len(response['body'].encode('utf-8'))
+            page_peaks.append(tracemalloc.get_traced_memory()[1] / 1024 / 1024)
+            after = response['headers'].get('X-Export-Next')
+
+        elapsed = time.perf_counter() - started
+        tracemalloc.stop()
+
+        print(f'Format: {export_format}, pages: {len(page_peaks)}, '
+              f'exported: {exported_bytes / 1024 / 1024:.1f} MB in {elapsed:.1f} s')
+        print(f'Python heap peak per page: first={page_peaks[0]:.1f} MB  '
+              f'median={sorted(page_peaks)[len(page_peaks) // 2]:.1f} MB  '
+              f'last={page_peaks[-1]:.1f} MB  max={max(page_peaks):.1f} MB')
+        print(f'Process max RSS: before={rss_before:.1f} MB  after={rss_mb():.1f} MB')
+    finally:
+        cleanup_events(conn)
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
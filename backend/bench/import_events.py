@@ -0,0 +1,94 @@
+"""
+Бенчмарк массового импорта событий (POST action=import в events/index.py).
+
+Загружает одни и те же строки двумя способами: одним запросом импорта
+(COPY в промежуточную таблицу и проверка одним запросом) и циклом обычных
+POST-запросов создания, по одному событию с отдельным соединением и
+транзакцией — так, как это выглядело бы с клиента без импорта. Выводит общее
+время, строк в секунду и число ошибок, найденных проверкой.
+
+Запуск: DATABASE_URL=... python backend/bench/import_events.py [строк] [ndjson|csv]
+"""
+
+import csv
+import io
+import json
+import sys
+import time
+
+from common import BENCH_PREFIX, bench_admin, cleanup_events, connect, load_function
+
+events_fn = load_function('events')
+
+
+def make_rows(count: int, responsible_ids) -> list:
+    return [{
+        'title': f'{BENCH_PREFIX}import {n}',
+        'type': 'meeting',
+        'date': f'2030-01-{n % 28 + 1:02d}',
+        'time': '10:00',
+        'endTime': '11:00',
+        'location': f'Кабинет {n % 50}',
+        'status': 'scheduled',
+        'responsible': list(responsible_ids),
+        'reminders': ['За час до начала'],
+    } for n in range(count)]
+
+
+def as_payload(rows: list, import_format: str) -> str:
+    if import_format == 'ndjson':
+        return '\n'.join(json.dumps(row, ensure_ascii=False) for row in rows)
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=list(rows[0].keys()))
+    writer.writeheader()
+    for row in rows:
+        writer.writerow({**row,
+                         'responsible': '; '.join(str(r) for r in row['responsible']),
+                         'reminders': '; '.join(row['reminders'])})
+    return output.getvalue()
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    import_format = sys.argv[2] if len(sys.argv) > 2 else 'ndjson'
+
+    conn = connect()
+    cur = conn.cursor()
+    admin = bench_admin(cur)
+    cur.execute("SELECT id FROM users ORDER BY id LIMIT 2")
+    responsible_ids = [r[0] for r in cur.fetchall()]
+    cur.close()
+    cleanup_events(conn)
+
+    rows = make_rows(count, responsible_ids)
+
+    try:
+        payload = as_payload(rows, import_format)
+        started = time.perf_counter()
+        response = events_fn.handle_import_events({'format': import_format, 'data': payload}, admin)
+        import_s = time.perf_counter() - started
+        result = json.loads(response['body'])
+        if response['statusCode'] != 200:
+            sys.exit(f'Import failed: {result}')
+        print(f'import action ({import_format})   rows={result["imported"]:<7} errors={len(result["errors"]):<5} '
+              f'{import_s:8.2f} s  {count / import_s:10.0f} rows/s')
+
+        cleanup_events(conn)
+
+        started = time.perf_counter()
+        for row in rows:
+            body = {**row, 'responsible': [{'id': r} for r in row['responsible']]}
+            response = events_fn.handle_create_event({'body': json.dumps(body)}, admin)
+            if response['statusCode'] != 201:
+                sys.exit(f'Create failed: {response["body"]}')
+        loop_s = time.perf_counter() - started
+        print(f'create loop (one POST per row) rows={count:<7} errors={0:<5} '
+              f'{loop_s:8.2f} s  {count / loop_s:10.0f} rows/s')
+        print(f'speedup: {loop_s / import_s:.1f}x')
+    finally:
+        cleanup_events(conn)
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
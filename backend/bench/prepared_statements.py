@@ -0,0 +1,124 @@
+"""
+Бенчмарк подготовленных запросов (PREPARED_STATEMENTS в events/index.py).
+
+Сравнивает запросы детальной карточки события и списка событий в двух режимах:
+тот же SQL, отправляемый текстом (разбор и планирование на каждый вызов),
+и EXECUTE подготовленного запроса. Отдельно выводит Planning Time из
+EXPLAIN (ANALYZE) для каждого горячего запроса и проверяет, что общий (generic)
+план списка читает только свою секцию events.
+
+Запуск: DATABASE_URL=... python backend/bench/prepared_statements.py [событий] [повторов]
+"""
+
+import re
+import sys
+
+from common import BENCH_PREFIX, cleanup_events, connect, load_function, report, seed_events, timed
+
+events_fn = load_function('events')
+STATEMENTS = events_fn.PREPARED_STATEMENTS
+
+
+def as_text_sql(name: str) -> str:
+    # $1, $2 ... -> %s, чтобы отправить тот же запрос без подготовки
+    return re.sub(r'\$\d+', '%s', STATEMENTS[name][1])
+
+
+def detail_request(cur, event_id: int, prepared: bool) -> None:
+    for name in ('event_by_id', 'event_responsible', 'event_reminders'):
+        if prepared:
+            events_fn.execute_prepared(cur, name, (event_id,))
+        else:
+            cur.execute(as_text_sql(name), (event_id,))
+        cur.fetchall()
+
+
+def list_request(cur, prepared: bool) -> None:
+    if prepared:
+        events_fn.execute_prepared(cur, 'events_active', ())
+    else:
+        cur.execute(STATEMENTS['events_active'][1])
+    for row in cur.fetchall():
+        detail_request_children(cur, row[0], prepared)
+
+
+def detail_request_children(cur, event_id: int, prepared: bool) -> None:
+    for name in ('event_responsible', 'event_reminders'):
+        if prepared:
+            events_fn.execute_prepared(cur, name, (event_id,))
+        else:
+            cur.execute(as_text_sql(name), (event_id,))
+        cur.fetchall()
+
+
+def planning_time(cur, sql: str, params: tuple) -> float:
+    cur.execute('EXPLAIN (ANALYZE, FORMAT JSON) ' + sql, params)
+    return cur.fetchone()[0][0]['Planning Time']
+
+
+def scanned_partitions(cur, sql: str, params: tuple) -> list:
+    cur.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+    found = []
+
+    def walk(node):
+        if node.get('Relation Name', '').startswith('events_'):
+            found.append(node['Relation Name'])
+        for child in node.get('Plans', []):
+            walk(child)
+
+    walk(cur.fetchone()[0][0]['Plan'])
+    return sorted(set(found))
+
+
+def main() -> None:
+    event_count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    conn = connect()
+    cleanup_events(conn)
+    seed_events(conn, event_count)
+    conn.autocommit = True
+    cur = conn.cursor()
+
+    try:
+        cur.execute("SELECT min(id) FROM events WHERE title LIKE %s", (BENCH_PREFIX + '%',))
+        event_id = cur.fetchone()[0]
+
+        print(f'Events seeded: {event_count}')
+        print('\nPlanning time per statement (EXPLAIN ANALYZE, ms):')
+        for name, params in (('event_by_id', (event_id,)),
+                             ('events_active', ()),
+                             ('event_responsible', (event_id,)),
+                             ('event_reminders', (event_id,))):
+            # Шесть EXECUTE подряд, чтобы план стал generic и перестал перепланироваться
+            for _ in range(6):
+                events_fn.execute_prepared(cur, name, params)
+                cur.fetchall()
+            arguments = f" ({', '.join(['%s'] * len(params))})" if params else ''
+            text_ms = planning_time(cur, as_text_sql(name), params)
+            prepared_ms = planning_time(cur, f'EXECUTE {name}{arguments}', params)
+            print(f'  {name:<20} text={text_ms:7.3f}  prepared={prepared_ms:7.3f}')
+
+        # Общий план списка должен по-прежнему читать только активную секцию
+        cur.execute("SET plan_cache_mode = force_generic_plan")
+        for name in ('events_active', 'events_archive'):
+            events_fn.execute_prepared(cur, name, ())
+            cur.fetchall()
+            print(f'  {name:<20} generic plan scans: {", ".join(scanned_partitions(cur, f"EXECUTE {name}", ()))}')
+        cur.execute("RESET plan_cache_mode")
+
+        print('\nRequest latency:')
+        report('detail, text SQL', timed(lambda: detail_request(cur, event_id, False), repeat))
+        report('detail, prepared', timed(lambda: detail_request(cur, event_id, True), repeat))
+        list_repeat = max(1, repeat // 20)
+        report('list, text SQL', timed(lambda: list_request(cur, False), list_repeat))
+        report('list, prepared', timed(lambda: list_request(cur, True), list_repeat))
+    finally:
+        cur.close()
+        conn.autocommit = False
+        cleanup_events(conn)
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
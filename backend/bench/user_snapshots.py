@@ -0,0 +1,89 @@
+"""
+Бенчмарк снимков "мой график" (GET action=my_schedule в events/index.py).
+
+Сравнивает ответ из готового снимка (hit) с пересборкой документа из событий
+(miss — тот же запрос, который без снимков выполнялся бы на каждое чтение).
+Затем прогоняет смешанную нагрузку: на каждые N чтений одно изменение события
+пользователя, — и выводит долю попаданий и среднюю задержку чтения против
+чтения, которое каждый раз собирает документ заново.
+
+Запуск: DATABASE_URL=... python backend/bench/user_snapshots.py [событий] [повторов] [чтений на запись]
+"""
+
+import statistics
+import sys
+
+from common import BENCH_PREFIX, cleanup_events, connect, load_function, report, seed_events, timed
+
+events_fn = load_function('events')
+
+
+def main() -> None:
+    event_count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    reads_per_write = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+
+    conn = connect()
+    cleanup_events(conn)
+    seed_events(conn, event_count)
+
+    cur = conn.cursor()
+    cur.execute("SELECT id FROM users ORDER BY id LIMIT 1")
+    user = {'user_id': cur.fetchone()[0], 'role': 'user'}
+    cur.execute("""
+        SELECT e.id FROM events e
+        JOIN event_responsible er ON er.event_id = e.id
+        WHERE er.user_id = %s AND e.title LIKE %s
+        ORDER BY e.date LIMIT 1
+    """, (user['user_id'], BENCH_PREFIX + '%'))
+    event_id = cur.fetchone()[0]
+    cur.close()
+
+    def invalidate():
+        cur = conn.cursor()
+        cur.execute("UPDATE user_schedule_snapshots SET generation = generation + 1 WHERE user_id = %s",
+                    (user['user_id'],))
+        conn.commit()
+        cur.close()
+
+    def read():
+        response = events_fn.handle_my_schedule(user, events_fn.get_read_connection())
+        if response['statusCode'] != 200:
+            sys.exit(f'my_schedule failed: {response["body"]}')
+        return response['headers'].get('X-Snapshot')
+
+    try:
+        read()
+        print(f'Events seeded: {event_count}')
+        report('snapshot hit', timed(read, repeat))
+
+        miss_samples = []
+        for _ in range(repeat):
+            invalidate()
+            miss_samples.extend(timed(read, 1))
+        report('snapshot miss (live rebuild)', miss_samples)
+
+        stats = events_fn._snapshot_stats
+        hits_before, misses_before = stats['hits'], stats['misses']
+        mixed = []
+        for n in range(repeat * reads_per_write):
+            if n % reads_per_write == 0:
+                cur = conn.cursor()
+                cur.execute("UPDATE events SET description = %s WHERE id = %s", (str(n), event_id))
+                conn.commit()
+                cur.close()
+            mixed.extend(timed(read, 1))
+        hits = stats['hits'] - hits_before
+        misses = stats['misses'] - misses_before
+
+        print(f'\nMixed load, {reads_per_write} reads per write:')
+        report('snapshot reads', mixed)
+        print(f'hit rate: {hits / (hits + misses):.1%}  '
+              f'mean vs live rebuild: {statistics.mean(mixed):.3f} ms vs {statistics.mean(miss_samples):.3f} ms')
+    finally:
+        cleanup_events(conn)
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
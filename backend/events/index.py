@@ -6,15 +6,391 @@ Returns: HTTP response с данными событий или ошибкой
 """
 
 import json
+import math
 import os
+import re
+import threading
+import time
 import jwt
-from typing import Dict, Any, Optional
+from collections import OrderedDict, deque
+from datetime import date, timedelta
+from typing import Dict, Any, List, Optional, Tuple
 
-def get_db_connection():
+# Статусы активной и архивной секций таблицы events (см. V0011)
+ACTIVE_STATUSES = ('scheduled', 'in-progress', 'pending')
+ARCHIVE_STATUSES = ('completed', 'cancelled', 'archived')
+
+# Допустимые типы событий (events_type_check)
+EVENT_TYPES = ('meeting', 'vks', 'hearing', 'committee', 'visit', 'reception', 'regional-trip')
+
+# Горячие запросы чтения: готовятся один раз на соединение через PREPARE и
+# дальше выполняются через EXECUTE без повторного разбора и планирования
+PREPARED_STATEMENTS = {
+    'event_by_id': ('(integer)', """
+        SELECT e.id, e.title, e.type, e.date, e.time, e.end_time, e.end_date,
+               e.location, e.vks_link, e.description, e.status, e.region_name,
+               e.is_multi_day, e.created_at, e.updated_at, e.version
+        FROM events e
+        WHERE e.id = $1
+    """),
+    'event_responsible': ('(integer)', """
+        SELECT u.id, u.full_name, u.position
+        FROM users u
+        JOIN event_responsible er ON u.id = er.user_id
+        WHERE er.event_id = $1
+    """),
+    'event_reminders': ('(integer)', """
+        SELECT reminder_text
+        FROM event_reminders
+        WHERE event_id = $1
+    """),
+    'user_schedule_snapshot': ('(integer)', """
+        SELECT document, generation = built_generation AND window_start = CURRENT_DATE
+        FROM user_schedule_snapshots
+        WHERE user_id = $1
+    """),
+}
+
+# Запросы по набору статусов готовятся отдельно для каждого scope, а статусы
+# записаны в SQL литералами: секция отсекается только по константе, и для
+# параметра ($1 text[]) общий план читал бы и архивную секцию
+EVENT_SCOPES = {
+    'active': ACTIVE_STATUSES,
+    'archive': ARCHIVE_STATUSES,
+    'all': ACTIVE_STATUSES + ARCHIVE_STATUSES,
+}
+
+for _scope, _statuses in EVENT_SCOPES.items():
+    _status_list = ', '.join(f"'{status}'" for status in _statuses)
+    PREPARED_STATEMENTS[f'events_{_scope}'] = ('', f"""
+        SELECT e.id, e.title, e.type, e.date, e.time, e.end_time, e.end_date,
+               e.location, e.vks_link, e.description, e.status, e.region_name,
+               e.is_multi_day, e.created_at, e.updated_at, e.version
+        FROM events e
+        WHERE e.status IN ({_status_list})
+        ORDER BY e.date DESC, e.time DESC
+    """)
+    PREPARED_STATEMENTS[f'calendar_fingerprint_{_scope}'] = ('(date, date)', f"""
+        SELECT count(*)::text || ':' || COALESCE(md5(string_agg(e.id || ':' || e.version, ',' ORDER BY e.id)), '')
+        FROM events e
+        WHERE daterange(e.date, GREATEST(COALESCE(e.end_date, e.date), e.date), '[]') && daterange($1, $2, '[]')
+          AND e.status IN ({_status_list})
+    """)
+    PREPARED_STATEMENTS[f'calendar_days_{_scope}'] = ('(date, date)', f"""
+        SELECT d::date, e.id, e.title, e.type, e.date, e.time, e.end_time, e.end_date,
+               e.status, e.region_name, e.is_multi_day, e.location
+        FROM events e
+        CROSS JOIN LATERAL generate_series(
+            GREATEST(e.date, $1), LEAST(GREATEST(COALESCE(e.end_date, e.date), e.date), $2), interval '1 day'
+        ) AS d
+        WHERE daterange(e.date, GREATEST(COALESCE(e.end_date, e.date), e.date), '[]') && daterange($1, $2, '[]')
+          AND e.status IN ({_status_list})
+        ORDER BY d, e.time, e.id
+    """)
+
+# Заявки на бронирование вместе с заявителем и одобрившим (V0016)
+BOOKING_SELECT = """
+    SELECT b.id, b.title, b.description, lower(b.slot), upper(b.slot), b.status,
+           b.created_at, b.approved_at, u.id, u.full_name, u.position, a.full_name, b.event_id
+    FROM booking_requests b
+    JOIN users u ON u.id = b.requested_by
+    LEFT JOIN users a ON a.id = b.approved_by
+"""
+
+# Снимки "мой график": длина окна и счётчики попаданий/пересборок в этом контейнере
+SNAPSHOT_DAYS = 14
+_snapshot_stats = {'hits': 0, 'misses': 0, 'refresh_ms_total': 0.0, 'refresh_ms_last': 0.0}
+
+# Календарь: максимальная длина окна (сетка месяца — 6 недель) и размер кэша
+CALENDAR_MAX_DAYS = 42
+CALENDAR_CACHE_SIZE = 64
+_calendar_cache: OrderedDict = OrderedDict()
+_calendar_cache_lock = threading.Lock()
+
+# Экспорт: строк на один ответ и строк на одну выборку серверного курсора
+EXPORT_PAGE_LIMIT = 5000
+EXPORT_ITERSIZE = 500
+
+EXPORT_COLUMNS = [
+    'id', 'title', 'type', 'date', 'time', 'endTime', 'endDate', 'location', 'vksLink',
+    'description', 'status', 'regionName', 'isMultiDay', 'createdAt', 'version',
+    'responsible', 'reminders'
+]
+
+# Импорт: поля строки в порядке колонок промежуточной таблицы
+IMPORT_FIELDS = [
+    'title', 'type', 'date', 'time', 'endTime', 'endDate', 'location', 'vksLink',
+    'description', 'status', 'regionName', 'isMultiDay', 'responsible', 'reminders'
+]
+
+# Long-poll изменений: канал NOTIFY и журнал event_changes (V0014), время ожидания,
+# размер буфера в памяти, период перепроверки журнала при ожидающих клиентах,
+# срок хранения журнала и период его очистки
+CHANGES_CHANNEL = 'event_changes'
+CHANGES_WAIT_SECONDS = 25
+CHANGES_BUFFER_SIZE = 1000
+CHANGES_RECHECK_SECONDS = 1
+CHANGES_RETENTION_SECONDS = 3600
+CHANGES_PRUNE_SECONDS = 60
+
+# Реплики для чтения (через запятую); без них всё читается с основного сервера
+REPLICA_DSNS = [dsn.strip() for dsn in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if dsn.strip()]
+REPLICA_MAX_LAG_SECONDS = float(os.environ.get('REPLICA_MAX_LAG_SECONDS', '5'))
+
+# Формат pg_lsn: две шестнадцатеричные половины через "/"; заголовок другого вида
+# игнорируется, иначе приведение ::pg_lsn падало бы на каждой проверке реплики
+LSN_PATTERN = re.compile(r'^[0-9A-Fa-f]{1,8}/[0-9A-Fa-f]{1,8}$')
+
+# Соединения для чтения переживают вызовы в рамках одного тёплого контейнера;
+# подготовленные запросы учитываются отдельно для каждого соединения
+_read_conns: Dict[str, Any] = {}
+_prepared: Dict[int, set] = {}
+
+def get_db_connection(dsn: Optional[str] = None):
     import psycopg2
-    dsn = os.environ.get('DATABASE_URL')
+    dsn = dsn or os.environ.get('DATABASE_URL')
     return psycopg2.connect(dsn)
 
+def get_cached_connection(dsn: str):
+    conn = _read_conns.get(dsn)
+    if conn is None or conn.closed:
+        conn = get_db_connection(dsn)
+        conn.autocommit = True
+        _read_conns[dsn] = conn
+        _prepared[id(conn)] = set()
+    return conn
+
+def drop_cached_connection(dsn: str):
+    conn = _read_conns.pop(dsn, None)
+    if conn is not None:
+        _prepared.pop(id(conn), None)
+        if not conn.closed:
+            conn.close()
+
+def replica_is_fresh(conn, min_lsn: Optional[str]) -> bool:
+    cur = conn.cursor()
+    # Весь полученный WAL применён — отставание равно давности последнего сообщения
+    # от основного сервера (он шлёт keepalive и при простое). Иначе — давности
+    # последней применённой транзакции. Реплика без потоковой репликации не годится:
+    # у отключённого приёмника полученный и применённый WAL тоже совпадают.
+    # Статус приёмника виден только с ролью pg_read_all_stats (pg_monitor), без неё
+    # он NULL и чтение уходит на основной сервер
+    cur.execute("""
+        SELECT pg_is_in_recovery(),
+               COALESCE(w.status = 'streaming', FALSE),
+               CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn()
+                    THEN EXTRACT(EPOCH FROM now() - w.last_msg_receipt_time)
+                    ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+               END,
+               %s::pg_lsn IS NULL OR pg_last_wal_replay_lsn() >= %s::pg_lsn
+        FROM (SELECT 1) AS one
+        LEFT JOIN pg_stat_wal_receiver w ON TRUE
+    """, (min_lsn, min_lsn))
+    in_recovery, streaming, lag, caught_up = cur.fetchone()
+    cur.close()
+    return bool(in_recovery and streaming and lag is not None
+                and lag <= REPLICA_MAX_LAG_SECONDS and caught_up)
+
+def get_read_dsn(min_lsn: Optional[str] = None) -> str:
+    import psycopg2
+    
+    # Реплика подходит, если она жива, не отстаёт и уже видит последнюю запись клиента
+    for dsn in REPLICA_DSNS:
+        try:
+            if replica_is_fresh(get_cached_connection(dsn), min_lsn):
+                return dsn
+        except psycopg2.Error:
+            drop_cached_connection(dsn)
+    return os.environ.get('DATABASE_URL')
+
+def get_read_connection(min_lsn: Optional[str] = None):
+    return get_cached_connection(get_read_dsn(min_lsn))
+
+def reset_read_connections():
+    for dsn in list(_read_conns):
+        drop_cached_connection(dsn)
+
+def get_min_lsn(headers: Dict[str, str]) -> Optional[str]:
+    value = (headers.get('x-min-lsn') or headers.get('X-Min-LSN') or '').strip()
+    return value if LSN_PATTERN.match(value) else None
+
+def get_write_lsn() -> Optional[str]:
+    import psycopg2
+    
+    # Позиция WAL после коммита: клиент передаёт её в X-Min-LSN при следующих чтениях
+    try:
+        cur = get_cached_connection(os.environ.get('DATABASE_URL')).cursor()
+        cur.execute("SELECT pg_current_wal_lsn()::text")
+        lsn = cur.fetchone()[0]
+        cur.close()
+        return lsn
+    except psycopg2.Error:
+        drop_cached_connection(os.environ.get('DATABASE_URL'))
+        return None
+
+def execute_prepared(cur, name: str, params: tuple):
+    import psycopg2
+    import psycopg2.errorcodes
+    
+    param_types, sql = PREPARED_STATEMENTS[name]
+    prepared = _prepared.setdefault(id(cur.connection), set())
+    arguments = f" ({', '.join(['%s'] * len(params))})" if params else ''
+    
+    for attempt in range(2):
+        try:
+            if name not in prepared:
+                try:
+                    cur.execute(f"PREPARE {name} {param_types} AS {sql}")
+                except psycopg2.Error as e:
+                    # Пулер выдал сессию, где запрос уже подготовлен — используем его
+                    if e.pgcode != psycopg2.errorcodes.DUPLICATE_PREPARED_STATEMENT:
+                        raise
+                prepared.add(name)
+            cur.execute(f"EXECUTE {name}{arguments}", params)
+            return
+        except psycopg2.Error as e:
+            if attempt == 1:
+                raise
+            if e.pgcode == psycopg2.errorcodes.INVALID_SQL_STATEMENT_NAME:
+                # Сессия сброшена (DISCARD ALL у пулера) — готовим заново
+                prepared.discard(name)
+            elif e.pgcode == psycopg2.errorcodes.FEATURE_NOT_SUPPORTED:
+                # "cached plan must not change result type" после изменения схемы
+                cur.execute(f"DEALLOCATE {name}")
+                prepared.discard(name)
+            else:
+                raise
+
+# Один LISTEN на контейнер; ожидающие запросы получают id изменённых событий
+def current_change_horizon(cur) -> int:
+    cur.execute("SELECT txid_snapshot_xmin(txid_current_snapshot())")
+    return cur.fetchone()[0]
+
+def read_changes(cur, since: int) -> Tuple[int, int, List[Tuple[int, int]]]:
+    # Возвращает (граница, граница очистки журнала, [(tx, event_id)] для since <= tx < граница).
+    # Граница — xmin снимка: транзакции ниже неё завершены, новых строк там не будет
+    cur.execute("""
+        SELECT h.xmin, p.pruned_through, c.tx, c.event_id
+        FROM (SELECT txid_snapshot_xmin(txid_current_snapshot()) AS xmin) h
+        CROSS JOIN event_changes_horizon p
+        LEFT JOIN event_changes c ON c.tx >= %s AND c.tx < h.xmin
+        ORDER BY c.tx
+    """, (since,))
+    rows = cur.fetchall()
+    return rows[0][0], rows[0][1], [(r[2], r[3]) for r in rows if r[2] is not None]
+
+def prune_changes(cur):
+    cur.execute("""
+        WITH pruned AS (
+            DELETE FROM event_changes
+            WHERE changed_at < CURRENT_TIMESTAMP - make_interval(secs => %s)
+            RETURNING tx
+        )
+        UPDATE event_changes_horizon
+        SET pruned_through = GREATEST(pruned_through, (SELECT max(tx) + 1 FROM pruned))
+        WHERE EXISTS (SELECT 1 FROM pruned)
+    """, (CHANGES_RETENTION_SECONDS,))
+
+class ChangeHub:
+    # Один LISTEN и один запрос к журналу на контейнер, сколько бы клиентов ни ждали.
+    # В буфере — изменения с tx в [start, horizon), отсортированные по tx
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.changes: deque = deque()
+        self.start_tx = 0
+        self.horizon = 0
+        self.waiters = 0
+        self.refreshes = 0
+        self.ready = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+    
+    def start(self):
+        with self.condition:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._listen, daemon=True)
+                self.thread.start()
+        self.ready.wait(timeout=2)
+    
+    def _refresh(self, cur):
+        if not self.horizon:
+            # Первый запуск: буфер начинается с текущей границы, более старые
+            # курсоры читаются из журнала напрямую
+            horizon = current_change_horizon(cur)
+            with self.condition:
+                self.refreshes += 1
+                self.start_tx = self.horizon = horizon
+            return
+        
+        horizon, _, changes = read_changes(cur, self.horizon)
+        with self.condition:
+            self.refreshes += 1
+            self.changes.extend(changes)
+            self.horizon = max(self.horizon, horizon)
+            while len(self.changes) > CHANGES_BUFFER_SIZE:
+                dropped = self.changes.popleft()[0]
+                while self.changes and self.changes[0][0] == dropped:
+                    self.changes.popleft()
+                self.start_tx = dropped + 1
+            if changes:
+                self.condition.notify_all()
+    
+    def _listen(self):
+        import select
+        import psycopg2
+        
+        while True:
+            conn = None
+            try:
+                conn = get_db_connection()
+                conn.autocommit = True
+                cur = conn.cursor()
+                cur.execute(f"LISTEN {CHANGES_CHANNEL}")
+                self._refresh(cur)
+                self.ready.set()
+                pruned_at = 0.0
+                
+                while True:
+                    # Пока клиенты ждут, журнал перечитывается и без уведомлений: строки
+                    # за долгой транзакцией становятся видны ниже границы позже своего NOTIFY
+                    timeout = CHANGES_RECHECK_SECONDS if self.waiters else 5
+                    if select.select([conn], [], [], timeout) != ([], [], []):
+                        conn.poll()
+                        conn.notifies.clear()
+                    elif not self.waiters:
+                        continue
+                    self._refresh(cur)
+                    
+                    if time.monotonic() - pruned_at > CHANGES_PRUNE_SECONDS:
+                        prune_changes(cur)
+                        pruned_at = time.monotonic()
+            except psycopg2.Error:
+                # Курсор хранится в базе, поэтому после переподключения буфер просто
+                # догоняет журнал с прежней границы
+                if conn is not None and not conn.closed:
+                    conn.close()
+                time.sleep(1)
+    
+    def wait(self, cursor: int, timeout: float) -> Optional[Tuple[int, List[int]]]:
+        # None — курсор старше буфера, изменения нужно прочитать из журнала напрямую
+        with self.condition:
+            if cursor < self.start_tx:
+                return None
+            self.waiters += 1
+            try:
+                self.condition.wait_for(lambda: self.changes and self.changes[-1][0] >= cursor, timeout)
+            finally:
+                self.waiters -= 1
+            if cursor < self.start_tx:
+                return None
+            ids = set()
+            for tx, event_id in reversed(self.changes):
+                if tx < cursor:
+                    break
+                ids.add(event_id)
+            return max(cursor, self.horizon), sorted(ids)
+
+_change_hub = ChangeHub()
+
 def verify_token(headers: Dict[str, str]) -> Optional[Dict[str, Any]]:
     token = headers.get('x-auth-token') or headers.get('X-Auth-Token')
     if not token:
@@ -35,8 +411,8 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'statusCode': 200,
             'headers': {
                 'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-Auth-Token',
+                'Access-Control-Allow-Methods': 'GET, POST, PUT, PATCH, DELETE, OPTIONS',
+                'Access-Control-Allow-Headers': 'Content-Type, X-Auth-Token, If-Match, X-Min-LSN',
                 'Access-Control-Max-Age': '86400'
             },
             'body': ''
@@ -52,12 +428,26 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     
     if method == 'GET':
         return handle_get_events(event, user)
-    elif method == 'POST':
-        return handle_create_event(event, user)
+    
+    if method == 'POST':
+        response = handle_create_event(event, user)
     elif method == 'PUT':
-        return handle_update_event(event, user)
+        response = handle_update_event(event, user)
+    elif method == 'PATCH':
+        response = handle_patch_event(event, user)
     elif method == 'DELETE':
-        return handle_delete_event(event, user)
+        response = handle_delete_event(event, user)
+    else:
+        response = None
+    
+    if response is not None:
+        # После записи сообщаем клиенту позицию WAL для чтения своих записей с реплик
+        response['headers']['Access-Control-Expose-Headers'] = 'ETag, X-Write-LSN'
+        if REPLICA_DSNS and response['statusCode'] < 400:
+            write_lsn = get_write_lsn()
+            if write_lsn:
+                response['headers']['X-Write-LSN'] = write_lsn
+        return response
     
     return {
         'statusCode': 405,
@@ -66,46 +456,63 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     }
 
 def handle_get_events(event: Dict[str, Any], user: Dict[str, Any]) -> Dict[str, Any]:
-    conn = get_db_connection()
+    import psycopg2
+    
+    params = event.get('queryStringParameters') or {}
+    min_lsn = get_min_lsn(event.get('headers') or {})
+    
+    if params.get('action') == 'export':
+        return handle_export_events(params, user, min_lsn)
+    if params.get('action') == 'changes':
+        return handle_wait_changes(params)
+    if params.get('action') == 'my_schedule':
+        try:
+            return handle_my_schedule(user, get_read_connection(min_lsn))
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            reset_read_connections()
+            return handle_my_schedule(user, get_read_connection(min_lsn))
+    if params.get('action') == 'snapshot_stats':
+        return handle_snapshot_stats(user)
+    if params.get('action') == 'bookings':
+        return handle_get_bookings(params, user)
+    if params.get('action') == 'calendar':
+        try:
+            return handle_calendar(params, get_read_connection(min_lsn))
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            reset_read_connections()
+            return handle_calendar(params, get_read_connection(min_lsn))
+    
+    try:
+        return _get_events(event, get_read_connection(min_lsn))
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        # Соединение оборвалось между вызовами — переподключаемся один раз
+        reset_read_connections()
+        return _get_events(event, get_read_connection(min_lsn))
+
+def _get_events(event: Dict[str, Any], conn) -> Dict[str, Any]:
     cur = conn.cursor()
     
     params = event.get('queryStringParameters') or {}
     event_id = params.get('id')
     
     if event_id:
-        cur.execute("""
-            SELECT e.id, e.title, e.type, e.date, e.time, e.end_time, e.end_date,
-                   e.location, e.vks_link, e.description, e.status, e.region_name,
-                   e.is_multi_day, e.created_at, e.updated_at
-            FROM events e
-            WHERE e.id = %s
-        """, (event_id,))
+        execute_prepared(cur, 'event_by_id', (int(event_id),))
         
         event_data = cur.fetchone()
         
         if not event_data:
             cur.close()
-            conn.close()
             return {
                 'statusCode': 404,
                 'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
                 'body': json.dumps({'error': 'Event not found'})
             }
         
-        cur.execute("""
-            SELECT u.id, u.full_name, u.position
-            FROM users u
-            JOIN event_responsible er ON u.id = er.user_id
-            WHERE er.event_id = %s
-        """, (event_id,))
+        execute_prepared(cur, 'event_responsible', (int(event_id),))
         
         responsible = [{'id': r[0], 'name': r[1], 'position': r[2]} for r in cur.fetchall()]
         
-        cur.execute("""
-            SELECT reminder_text
-            FROM event_reminders
-            WHERE event_id = %s
-        """, (event_id,))
+        execute_prepared(cur, 'event_reminders', (int(event_id),))
         
         reminders = [r[0] for r in cur.fetchall()]
         
@@ -125,11 +532,11 @@ def handle_get_events(event: Dict[str, Any], user: Dict[str, Any]) -> Dict[str,
             'isMultiDay': event_data[12],
             'responsible': responsible,
             'reminders': reminders,
-            'createdAt': event_data[13].isoformat()
+            'createdAt': event_data[13].isoformat(),
+            'version': event_data[15]
         }
         
         cur.close()
-        conn.close()
         
         return {
             'statusCode': 200,
@@ -137,32 +544,22 @@ def handle_get_events(event: Dict[str, Any], user: Dict[str, Any]) -> Dict[str,
             'body': json.dumps(result)
         }
     
-    cur.execute("""
-        SELECT e.id, e.title, e.type, e.date, e.time, e.end_time, e.end_date,
-               e.location, e.vks_link, e.description, e.status, e.region_name,
-               e.is_multi_day, e.created_at, e.updated_at
-        FROM events e
-        ORDER BY e.date DESC, e.time DESC
-    """)
+    # По умолчанию читаем только активную секцию; архив — по scope=archive или scope=all
+    scope = params.get('scope', 'active')
+    if scope not in EVENT_SCOPES:
+        scope = 'active'
+    
+    execute_prepared(cur, f'events_{scope}', ())
     
     events_list = []
     for row in cur.fetchall():
         event_id = row[0]
         
-        cur.execute("""
-            SELECT u.id, u.full_name, u.position
-            FROM users u
-            JOIN event_responsible er ON u.id = er.user_id
-            WHERE er.event_id = %s
-        """, (event_id,))
+        execute_prepared(cur, 'event_responsible', (event_id,))
         
         responsible = [{'id': r[0], 'name': r[1], 'position': r[2]} for r in cur.fetchall()]
         
-        cur.execute("""
-            SELECT reminder_text
-            FROM event_reminders
-            WHERE event_id = %s
-        """, (event_id,))
+        execute_prepared(cur, 'event_reminders', (event_id,))
         
         reminders = [r[0] for r in cur.fetchall()]
         
@@ -182,11 +579,11 @@ def handle_get_events(event: Dict[str, Any], user: Dict[str, Any]) -> Dict[str,
             'isMultiDay': row[12],
             'responsible': responsible,
             'reminders': reminders,
-            'createdAt': row[13].isoformat()
+            'createdAt': row[13].isoformat(),
+            'version': row[15]
         })
     
     cur.close()
-    conn.close()
     
     return {
         'statusCode': 200,
@@ -194,50 +591,138 @@ def handle_get_events(event: Dict[str, Any], user: Dict[str, Any]) -> Dict[str,
         'body': json.dumps({'events': events_list})
     }
 
-def handle_create_event(event: Dict[str, Any], user: Dict[str, Any]) -> Dict[str, Any]:
-    body_data = json.loads(event.get('body', '{}'))
+def insert_event(cur, body_data: Dict[str, Any], user: Dict[str, Any]) -> int:
+    time_value = body_data.get('time') or '00:00'
+    end_time_value = body_data.get('endTime') or None
     
-    conn = get_db_connection()
-    cur = conn.cursor()
+    cur.execute("""
+        INSERT INTO events (title, type, date, time, end_time, end_date, location, vks_link, 
+                          description, status, region_name, is_multi_day, created_by)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        RETURNING id
+    """, (
+        body_data.get('title'),
+        body_data.get('type'),
+        body_data.get('date'),
+        time_value,
+        end_time_value,
+        body_data.get('endDate') or None,
+        body_data.get('location') or None,
+        body_data.get('vksLink') or None,
+        body_data.get('description') or None,
+        body_data.get('status', 'scheduled'),
+        body_data.get('regionName') or None,
+        body_data.get('isMultiDay', False),
+        user['user_id']
+    ))
     
-    try:
-        time_value = body_data.get('time') or '00:00'
-        end_time_value = body_data.get('endTime') or None
-        
+    event_id = cur.fetchone()[0]
+    
+    for resp in body_data.get('responsible', []):
         cur.execute("""
-            INSERT INTO events (title, type, date, time, end_time, end_date, location, vks_link, 
-                              description, status, region_name, is_multi_day, created_by)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            RETURNING id
-        """, (
-            body_data.get('title'),
-            body_data.get('type'),
-            body_data.get('date'),
-            time_value,
-            end_time_value,
-            body_data.get('endDate') or None,
-            body_data.get('location') or None,
-            body_data.get('vksLink') or None,
-            body_data.get('description') or None,
-            body_data.get('status', 'scheduled'),
-            body_data.get('regionName') or None,
-            body_data.get('isMultiDay', False),
-            user['user_id']
-        ))
-        
-        event_id = cur.fetchone()[0]
-        
+            INSERT INTO event_responsible (event_id, user_id)
+            VALUES (%s, %s)
+        """, (event_id, resp['id']))
+    
+    for reminder in body_data.get('reminders', []):
+        cur.execute("""
+            INSERT INTO event_reminders (event_id, reminder_text)
+            VALUES (%s, %s)
+        """, (event_id, reminder))
+    
+    return event_id
+
+def update_event(cur, event_id: Any, body_data: Dict[str, Any]) -> bool:
+    # Используем COALESCE для сохранения существующих значений если новое значение NULL
+    cur.execute("""
+        UPDATE events
+        SET title = COALESCE(%s, title),
+            type = COALESCE(%s, type),
+            date = COALESCE(%s, date),
+            time = COALESCE(%s, time),
+            end_time = COALESCE(%s, end_time),
+            end_date = COALESCE(%s, end_date),
+            location = COALESCE(%s, location),
+            vks_link = COALESCE(%s, vks_link),
+            description = COALESCE(%s, description),
+            status = COALESCE(%s, status),
+            region_name = COALESCE(%s, region_name),
+            is_multi_day = COALESCE(%s, is_multi_day),
+            updated_at = CURRENT_TIMESTAMP,
+            version = version + 1
+        WHERE id = %s
+    """, (
+        body_data.get('title'),
+        body_data.get('type'),
+        body_data.get('date'),
+        body_data.get('time'),
+        body_data.get('endTime'),
+        body_data.get('endDate'),
+        body_data.get('location'),
+        body_data.get('vksLink'),
+        body_data.get('description'),
+        body_data.get('status'),
+        body_data.get('regionName'),
+        body_data.get('isMultiDay'),
+        event_id
+    ))
+    updated = cur.rowcount > 0
+    
+    # Обновляем ответственных только если они переданы
+    if 'responsible' in body_data:
+        cur.execute("DELETE FROM event_responsible WHERE event_id = %s", (event_id,))
         for resp in body_data.get('responsible', []):
             cur.execute("""
                 INSERT INTO event_responsible (event_id, user_id)
                 VALUES (%s, %s)
             """, (event_id, resp['id']))
-        
+    
+    # Обновляем напоминания только если они переданы
+    if 'reminders' in body_data:
+        cur.execute("DELETE FROM event_reminders WHERE event_id = %s", (event_id,))
         for reminder in body_data.get('reminders', []):
             cur.execute("""
                 INSERT INTO event_reminders (event_id, reminder_text)
                 VALUES (%s, %s)
             """, (event_id, reminder))
+    
+    return updated
+
+def delete_events(cur, event_ids: List[int]) -> List[int]:
+    cur.execute("DELETE FROM event_reminders WHERE event_id = ANY(%s)", (event_ids,))
+    cur.execute("DELETE FROM event_responsible WHERE event_id = ANY(%s)", (event_ids,))
+    cur.execute("DELETE FROM events WHERE id = ANY(%s) RETURNING id", (event_ids,))
+    return [r[0] for r in cur.fetchall()]
+
+def set_events_status(cur, event_ids: List[int], status: str,
+                      versions: Optional[List[Optional[int]]] = None) -> List[int]:
+    # version = NULL означает "без предусловия" для конкретного события
+    cur.execute("""
+        UPDATE events e
+        SET status = %s, updated_at = CURRENT_TIMESTAMP, version = e.version + 1
+        FROM unnest(%s::integer[], %s::integer[]) AS v(id, version)
+        WHERE e.id = v.id AND (v.version IS NULL OR e.version = v.version)
+        RETURNING e.id
+    """, (status, event_ids, versions or [None] * len(event_ids)))
+    return [r[0] for r in cur.fetchall()]
+
+def handle_create_event(event: Dict[str, Any], user: Dict[str, Any]) -> Dict[str, Any]:
+    body_data = json.loads(event.get('body', '{}'))
+    
+    if body_data.get('action') == 'batch':
+        return handle_batch_events(body_data, user)
+    if body_data.get('action') == 'import':
+        return handle_import_events(body_data, user)
+    if body_data.get('action') == 'booking_submit':
+        return handle_submit_booking(body_data, user)
+    if body_data.get('action') in ('booking_approve', 'booking_reject'):
+        return handle_review_bookings(body_data, user)
+    
+    conn = get_db_connection()
+    cur = conn.cursor()
+    
+    try:
+        event_id = insert_event(cur, body_data, user)
         
         conn.commit()
         cur.close()
@@ -276,56 +761,192 @@ def handle_update_event(event: Dict[str, Any], user: Dict[str, Any]) -> Dict[str
     cur = conn.cursor()
     
     try:
-        # Используем COALESCE для сохранения существующих значений если новое значение NULL
-        cur.execute("""
+        update_event(cur, event_id, body_data)
+        
+        conn.commit()
+        cur.close()
+        conn.close()
+        
+        return {
+            'statusCode': 200,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'message': 'Event updated'})
+        }
+    except Exception as e:
+        print(f"ERROR updating event: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        conn.rollback()
+        cur.close()
+        conn.close()
+        
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': str(e)})
+        }
+
+# Поля события, которые можно менять через PATCH: ключ в JSON -> колонка
+PATCH_FIELDS = {
+    'title': 'title',
+    'type': 'type',
+    'date': 'date',
+    'time': 'time',
+    'endTime': 'end_time',
+    'endDate': 'end_date',
+    'location': 'location',
+    'vksLink': 'vks_link',
+    'description': 'description',
+    'status': 'status',
+    'regionName': 'region_name',
+    'isMultiDay': 'is_multi_day',
+}
+
+def parse_if_match(headers: Dict[str, str]) -> Optional[int]:
+    value = headers.get('if-match') or headers.get('If-Match')
+    if not value or value.strip() == '*':
+        return None
+    value = value.strip()
+    if value.startswith('W/'):
+        value = value[2:]
+    return int(value.strip('"'))
+
+def patch_event(cur, event_id: Any, body_data: Dict[str, Any],
+                expected_version: Optional[int]) -> Tuple[str, Optional[int], bool]:
+    # Возвращает (not_found | conflict | ok, текущая версия, были ли изменения)
+    # Блокируем строку, чтобы проверка версии и запись были атомарны
+    cur.execute("SELECT version FROM events WHERE id = %s FOR UPDATE", (event_id,))
+    row = cur.fetchone()
+    
+    if not row:
+        return 'not_found', None, False
+    
+    current_version = row[0]
+    
+    if expected_version is not None and expected_version != current_version:
+        return 'conflict', current_version, False
+    
+    fields_changed = False
+    children_changed = False
+    
+    # Пишем только переданные поля и только если значение действительно меняется;
+    # null очищает поле
+    fields = [(column, body_data[key]) for key, column in PATCH_FIELDS.items() if key in body_data]
+    if fields:
+        assignments = ', '.join(f'{column} = %s' for column, _ in fields)
+        differs = ' OR '.join(f'{column} IS DISTINCT FROM %s' for column, _ in fields)
+        values = [value for _, value in fields]
+        cur.execute(f"""
             UPDATE events
-            SET title = COALESCE(%s, title),
-                type = COALESCE(%s, type),
-                date = COALESCE(%s, date),
-                time = COALESCE(%s, time),
-                end_time = COALESCE(%s, end_time),
-                end_date = COALESCE(%s, end_date),
-                location = COALESCE(%s, location),
-                vks_link = COALESCE(%s, vks_link),
-                description = COALESCE(%s, description),
-                status = COALESCE(%s, status),
-                region_name = COALESCE(%s, region_name),
-                is_multi_day = COALESCE(%s, is_multi_day),
-                updated_at = CURRENT_TIMESTAMP
-            WHERE id = %s
-        """, (
-            body_data.get('title'),
-            body_data.get('type'),
-            body_data.get('date'),
-            body_data.get('time'),
-            body_data.get('endTime'),
-            body_data.get('endDate'),
-            body_data.get('location'),
-            body_data.get('vksLink'),
-            body_data.get('description'),
-            body_data.get('status'),
-            body_data.get('regionName'),
-            body_data.get('isMultiDay'),
-            event_id
-        ))
-        
-        # Обновляем ответственных только если они переданы
-        if 'responsible' in body_data:
+            SET {assignments}, updated_at = CURRENT_TIMESTAMP, version = version + 1
+            WHERE id = %s AND ({differs})
+        """, (*values, event_id, *values))
+        fields_changed = cur.rowcount > 0
+    
+    if 'responsible' in body_data:
+        new_ids = sorted({int(resp['id']) for resp in body_data.get('responsible') or []})
+        cur.execute("SELECT user_id FROM event_responsible WHERE event_id = %s ORDER BY user_id", (event_id,))
+        if [r[0] for r in cur.fetchall()] != new_ids:
             cur.execute("DELETE FROM event_responsible WHERE event_id = %s", (event_id,))
-            for resp in body_data.get('responsible', []):
+            for user_id in new_ids:
                 cur.execute("""
                     INSERT INTO event_responsible (event_id, user_id)
                     VALUES (%s, %s)
-                """, (event_id, resp['id']))
-        
-        # Обновляем напоминания только если они переданы
-        if 'reminders' in body_data:
+                """, (event_id, user_id))
+            children_changed = True
+    
+    if 'reminders' in body_data:
+        new_reminders = list(body_data.get('reminders') or [])
+        cur.execute("SELECT reminder_text FROM event_reminders WHERE event_id = %s ORDER BY id", (event_id,))
+        if [r[0] for r in cur.fetchall()] != new_reminders:
             cur.execute("DELETE FROM event_reminders WHERE event_id = %s", (event_id,))
-            for reminder in body_data.get('reminders', []):
+            for reminder in new_reminders:
                 cur.execute("""
                     INSERT INTO event_reminders (event_id, reminder_text)
                     VALUES (%s, %s)
                 """, (event_id, reminder))
+            children_changed = True
+    
+    # Изменение только ответственных или напоминаний тоже новая версия события
+    if children_changed and not fields_changed:
+        cur.execute("""
+            UPDATE events
+            SET version = version + 1, updated_at = CURRENT_TIMESTAMP
+            WHERE id = %s
+        """, (event_id,))
+    
+    changed = fields_changed or children_changed
+    if changed:
+        current_version += 1
+    
+    return 'ok', current_version, changed
+
+def moved_event_outcome(cur, event_id: Any) -> Tuple[str, Optional[int], bool]:
+    # После SerializationFailure: статус события параллельно изменили, и строка
+    # переехала в другую секцию (V0011) — для клиента это конфликт версий
+    cur.execute("SELECT version FROM events WHERE id = %s", (event_id,))
+    row = cur.fetchone()
+    if not row:
+        return 'not_found', None, False
+    return 'conflict', row[0], False
+
+def handle_patch_event(event: Dict[str, Any], user: Dict[str, Any]) -> Dict[str, Any]:
+    import psycopg2.errors
+    
+    body_data = json.loads(event.get('body', '{}'))
+    event_id = body_data.get('id')
+    
+    if not event_id:
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': 'Event ID required'})
+        }
+    
+    try:
+        expected_version = parse_if_match(event.get('headers') or {})
+        if expected_version is None and body_data.get('version') is not None:
+            expected_version = int(body_data['version'])
+    except ValueError:
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': 'Invalid version precondition'})
+        }
+    
+    conn = get_db_connection()
+    cur = conn.cursor()
+    
+    try:
+        try:
+            outcome, current_version, changed = patch_event(cur, event_id, body_data, expected_version)
+        except psycopg2.errors.SerializationFailure:
+            conn.rollback()
+            outcome, current_version, changed = moved_event_outcome(cur, event_id)
+        
+        if outcome == 'not_found':
+            conn.rollback()
+            cur.close()
+            conn.close()
+            return {
+                'statusCode': 404,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps({'error': 'Event not found'})
+            }
+        
+        if outcome == 'conflict':
+            conn.rollback()
+            cur.close()
+            conn.close()
+            return {
+                'statusCode': 409,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*',
+                    'ETag': f'"{current_version}"'
+                },
+                'body': json.dumps({'error': 'Version conflict', 'version': current_version})
+            }
         
         conn.commit()
         cur.close()
@@ -333,13 +954,18 @@ def handle_update_event(event: Dict[str, Any], user: Dict[str, Any]) -> Dict[str
         
         return {
             'statusCode': 200,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'message': 'Event updated'})
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*',
+                'ETag': f'"{current_version}"'
+            },
+            'body': json.dumps({
+                'message': 'Event updated' if changed else 'No changes',
+                'changed': changed,
+                'version': current_version
+            })
         }
     except Exception as e:
-        print(f"ERROR updating event: {str(e)}")
-        import traceback
-        traceback.print_exc()
         conn.rollback()
         cur.close()
         conn.close()
@@ -372,9 +998,7 @@ def handle_delete_event(event: Dict[str, Any], user: Dict[str, Any]) -> Dict[str
     cur = conn.cursor()
     
     try:
-        cur.execute("DELETE FROM event_reminders WHERE event_id = %s", (event_id,))
-        cur.execute("DELETE FROM event_responsible WHERE event_id = %s", (event_id,))
-        cur.execute("DELETE FROM events WHERE id = %s", (event_id,))
+        delete_events(cur, [int(event_id)])
         conn.commit()
         cur.close()
         conn.close()
@@ -393,4 +1017,1032 @@ def handle_delete_event(event: Dict[str, Any], user: Dict[str, Any]) -> Dict[str
             'statusCode': 400,
             'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
             'body': json.dumps({'error': str(e)})
-        }
\ No newline at end of file
+        }
+
+def is_status_update(operation: Dict[str, Any]) -> bool:
+    data = operation.get('data') or {}
+    return operation.get('op') == 'update' and set(data.keys()) == {'status'}
+
+def group_batch_operations(operations: List[Dict[str, Any]]) -> List[List[int]]:
+    # Подряд идущие удаления и смены статуса на одно значение объединяются
+    # в один set-based запрос; порядок операций при этом сохраняется
+    groups: List[List[int]] = []
+    previous_key = None
+    for index, operation in enumerate(operations):
+        if operation.get('op') == 'delete':
+            key = ('delete',)
+        elif is_status_update(operation):
+            key = ('status', operation['data']['status'])
+        else:
+            key = None
+        
+        if key is not None and key == previous_key:
+            groups[-1].append(index)
+        else:
+            groups.append([index])
+        previous_key = key
+    return groups
+
+def run_batch_group(cur, operations: List[Dict[str, Any]], indexes: List[int],
+                    user: Dict[str, Any]) -> Dict[int, Dict[str, Any]]:
+    first = operations[indexes[0]]
+    op = first.get('op')
+    
+    if op == 'create':
+        event_id = insert_event(cur, first.get('data') or {}, user)
+        return {indexes[0]: {'status': 'ok', 'id': event_id}}
+    
+    if op not in ('update', 'delete'):
+        raise ValueError(f'Unknown operation: {op}')
+    
+    if op == 'delete' and user.get('role') != 'admin':
+        raise PermissionError('Only admin can delete events')
+    
+    ids = [int(operations[i].get('id')) for i in indexes]
+    
+    if op == 'update' and not is_status_update(first):
+        # Обычное обновление в пакете работает как PATCH: только переданные поля
+        # и проверка version, если она указана
+        version = first.get('version')
+        outcome, current_version, changed = patch_event(
+            cur, ids[0], first.get('data') or {}, int(version) if version is not None else None
+        )
+        if outcome == 'not_found':
+            result = {'status': 'error', 'id': ids[0], 'error': 'Event not found'}
+        elif outcome == 'conflict':
+            result = {'status': 'error', 'id': ids[0], 'error': 'Version conflict', 'version': current_version}
+        else:
+            result = {'status': 'ok', 'id': ids[0], 'version': current_version, 'changed': changed}
+        return {indexes[0]: result}
+    
+    if op == 'delete':
+        affected = set(delete_events(cur, ids))
+    else:
+        versions = [operations[i].get('version') for i in indexes]
+        affected = set(set_events_status(cur, ids, first['data']['status'], versions))
+    
+    return {
+        i: {'status': 'ok', 'id': event_id} if event_id in affected
+        else {'status': 'error', 'id': event_id, 'error': 'Event not found or version conflict'}
+        for i, event_id in zip(indexes, ids)
+    }
+
+def batch_error(cur, operation: Dict[str, Any], error: Exception) -> Dict[str, Any]:
+    import psycopg2.errors
+    
+    if isinstance(error, psycopg2.errors.SerializationFailure) and operation.get('op') == 'update':
+        event_id = int(operation.get('id'))
+        outcome, current_version, _ = moved_event_outcome(cur, event_id)
+        if outcome == 'conflict':
+            return {'status': 'error', 'id': event_id, 'error': 'Version conflict', 'version': current_version}
+        return {'status': 'error', 'id': event_id, 'error': 'Event not found'}
+    return {'status': 'error', 'error': str(error)}
+
+def handle_batch_events(body_data: Dict[str, Any], user: Dict[str, Any]) -> Dict[str, Any]:
+    operations = body_data.get('operations')
+    atomic = body_data.get('atomic', True)
+    
+    if not isinstance(operations, list) or not operations:
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': 'Operations list required'})
+        }
+    
+    conn = get_db_connection()
+    cur = conn.cursor()
+    
+    results: Dict[int, Dict[str, Any]] = {}
+    
+    try:
+        for indexes in group_batch_operations(operations):
+            # Каждая группа выполняется под своей точкой сохранения: при ошибке
+            # set-based запроса операции повторяются по одной, чтобы найти виновную
+            cur.execute("SAVEPOINT batch_group")
+            try:
+                results.update(run_batch_group(cur, operations, indexes, user))
+                cur.execute("RELEASE SAVEPOINT batch_group")
+                continue
+            except Exception as e:
+                cur.execute("ROLLBACK TO SAVEPOINT batch_group")
+                if len(indexes) == 1:
+                    results[indexes[0]] = batch_error(cur, operations[indexes[0]], e)
+                    continue
+            
+            for index in indexes:
+                cur.execute("SAVEPOINT batch_operation")
+                try:
+                    results.update(run_batch_group(cur, operations, [index], user))
+                    cur.execute("RELEASE SAVEPOINT batch_operation")
+                except Exception as e:
+                    cur.execute("ROLLBACK TO SAVEPOINT batch_operation")
+                    results[index] = batch_error(cur, operations[index], e)
+        
+        ordered = [{'index': i, 'op': operations[i].get('op'), **results[i]} for i in range(len(operations))]
+        failed = any(r['status'] == 'error' for r in ordered)
+        
+        # В режиме "всё или ничего" любая ошибка откатывает весь пакет
+        if atomic and failed:
+            conn.rollback()
+            for r in ordered:
+                if r['status'] == 'ok':
+                    r['status'] = 'rolled_back'
+                    if operations[r['index']].get('op') == 'create':
+                        r.pop('id', None)
+        else:
+            conn.commit()
+        
+        cur.close()
+        conn.close()
+        
+        response_body = {'atomic': atomic, 'results': ordered}
+        if atomic and failed:
+            # Сводка для клиента: без поля error он показал бы только "Request failed"
+            errors = [r for r in ordered if r['status'] == 'error']
+            first = errors[0]
+            response_body['error'] = (
+                f"{len(errors)} operation(s) failed; first at index {first['index']}: "
+                f"{first.get('error', 'unknown error')}"
+            )
+        
+        return {
+            'statusCode': 400 if atomic and failed else 200,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps(response_body)
+        }
+    except Exception as e:
+        conn.rollback()
+        cur.close()
+        conn.close()
+        
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': str(e)})
+        }
+
+def handle_export_events(params: Dict[str, str], user: Dict[str, Any],
+                         min_lsn: Optional[str] = None) -> Dict[str, Any]:
+    import csv
+    import io
+    
+    if user.get('role') != 'admin':
+        return {
+            'statusCode': 403,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': 'Only admin can export events'})
+        }
+    
+    export_format = params.get('format', 'ndjson')
+    if export_format not in ('ndjson', 'csv'):
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': 'Format must be ndjson or csv'})
+        }
+    
+    scope = params.get('scope', 'all')
+    if scope == 'active':
+        statuses = ACTIVE_STATUSES
+    elif scope == 'archive':
+        statuses = ARCHIVE_STATUSES
+    else:
+        statuses = ACTIVE_STATUSES + ARCHIVE_STATUSES
+    
+    try:
+        after = int(params.get('after', 0))
+        limit = max(1, min(int(params.get('limit', EXPORT_PAGE_LIMIT)), EXPORT_PAGE_LIMIT))
+    except ValueError:
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': 'after and limit must be integers'})
+        }
+    
+    conn = get_db_connection(get_read_dsn(min_lsn))
+    # Именованный курсор живёт на сервере: в память попадает не больше itersize строк.
+    # Ответственные и напоминания агрегируются в том же запросе, без N+1
+    cur = conn.cursor(name='events_export')
+    cur.itersize = EXPORT_ITERSIZE
+    
+    output = io.StringIO()
+    writer = csv.writer(output)
+    count = 0
+    last_id = None
+    
+    try:
+        cur.execute("""
+            SELECT e.id, e.title, e.type, e.date, e.time, e.end_time, e.end_date,
+                   e.location, e.vks_link, e.description, e.status, e.region_name,
+                   e.is_multi_day, e.created_at, e.version,
+                   COALESCE(r.responsible, '[]'::json), COALESCE(m.reminders, '{}')
+            FROM events e
+            LEFT JOIN LATERAL (
+                SELECT json_agg(json_build_object('id', u.id, 'name', u.full_name, 'position', u.position)
+                                ORDER BY u.full_name) AS responsible
+                FROM event_responsible er
+                JOIN users u ON u.id = er.user_id
+                WHERE er.event_id = e.id
+            ) r ON TRUE
+            LEFT JOIN LATERAL (
+                SELECT array_agg(reminder_text ORDER BY id) AS reminders
+                FROM event_reminders
+                WHERE event_id = e.id
+            ) m ON TRUE
+            WHERE e.status IN %s AND e.id > %s
+            ORDER BY e.id
+            LIMIT %s
+        """, (statuses, after, limit))
+        
+        if export_format == 'csv' and after == 0:
+            writer.writerow(EXPORT_COLUMNS)
+        
+        for row in cur:
+            count += 1
+            last_id = row[0]
+            record = [
+                str(row[0]),
+                row[1],
+                row[2],
+                row[3].isoformat(),
+                str(row[4]) if row[4] else None,
+                str(row[5]) if row[5] else None,
+                row[6].isoformat() if row[6] else None,
+                row[7],
+                row[8],
+                row[9],
+                row[10],
+                row[11],
+                row[12],
+                row[13].isoformat() if row[13] else None,
+                row[14],
+                row[15],
+                row[16],
+            ]
+            if export_format == 'csv':
+                # Ответственные — id пользователей, как их ждёт импорт
+                record[15] = '; '.join(str(r['id']) for r in record[15])
+                record[16] = '; '.join(record[16])
+                writer.writerow(record)
+            else:
+                output.write(json.dumps(dict(zip(EXPORT_COLUMNS, record)), ensure_ascii=False))
+                output.write('\n')
+        
+        cur.close()
+        conn.rollback()
+        conn.close()
+    except Exception as e:
+        # Серверный курсор закрывается вместе с транзакцией
+        conn.rollback()
+        conn.close()
+        
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': str(e)})
+        }
+    
+    headers = {
+        'Content-Type': 'text/csv; charset=utf-8' if export_format == 'csv' else 'application/x-ndjson',
+        'Content-Disposition': f'attachment; filename="events.{export_format}"',
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Expose-Headers': 'X-Export-Next'
+    }
+    # Полная страница — возможно, есть продолжение; клиент запрашивает его с after=X-Export-Next
+    if count == limit:
+        headers['X-Export-Next'] = str(last_id)
+    
+    return {
+        'statusCode': 200,
+        'headers': headers,
+        'body': output.getvalue()
+    }
+
+
+def parse_import_rows(data: str, import_format: str):
+    import csv
+    import io
+    
+    # Возвращает (строки для промежуточной таблицы, ошибки разбора по номерам строк)
+    if import_format == 'csv':
+        records = enumerate(csv.DictReader(io.StringIO(data)), start=1)
+    else:
+        records = enumerate((line for line in data.splitlines() if line.strip()), start=1)
+    
+    rows = []
+    errors = []
+    for row_no, record in records:
+        if import_format == 'ndjson':
+            try:
+                record = json.loads(record)
+            except ValueError as e:
+                errors.append({'row': row_no, 'errors': [f'Invalid JSON: {e}']})
+                continue
+            if not isinstance(record, dict):
+                errors.append({'row': row_no, 'errors': ['Row must be a JSON object']})
+                continue
+        
+        # В CSV ответственные — id пользователей, напоминания — тексты; оба через ";".
+        # В NDJSON — списки: id или объекты с id и строки
+        row_errors = []
+        
+        responsible = record.get('responsible') or []
+        if isinstance(responsible, str):
+            responsible = [v.strip() for v in responsible.split(';') if v.strip()]
+        if isinstance(responsible, list) and all(
+            isinstance(r, (str, int)) and not isinstance(r, bool)
+            or isinstance(r, dict) and isinstance(r.get('id'), (str, int)) and not isinstance(r.get('id'), bool)
+            for r in responsible
+        ):
+            responsible = [str(r['id']) if isinstance(r, dict) else str(r) for r in responsible]
+        else:
+            row_errors.append('responsible must be a list of user ids or objects with id')
+        
+        reminders = record.get('reminders') or []
+        if isinstance(reminders, str) and import_format == 'csv':
+            reminders = [v.strip() for v in reminders.split(';') if v.strip()]
+        if not isinstance(reminders, list) or not all(isinstance(r, str) for r in reminders):
+            row_errors.append('reminders must be a list of strings')
+        
+        if row_errors:
+            errors.append({'row': row_no, 'errors': row_errors})
+            continue
+        
+        is_multi_day = record.get('isMultiDay')
+        if isinstance(is_multi_day, bool):
+            is_multi_day = 'true' if is_multi_day else 'false'
+        
+        values = [record.get(field) for field in IMPORT_FIELDS[:11]]
+        rows.append([row_no, *values, is_multi_day, json.dumps(responsible), json.dumps(reminders)])
+    
+    return rows, errors
+
+def handle_import_events(body_data: Dict[str, Any], user: Dict[str, Any]) -> Dict[str, Any]:
+    import csv
+    import io
+    
+    if user.get('role') != 'admin':
+        return {
+            'statusCode': 403,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': 'Only admin can import events'})
+        }
+    
+    import_format = body_data.get('format', 'ndjson')
+    data = body_data.get('data')
+    atomic = body_data.get('atomic', False)
+    
+    if import_format not in ('ndjson', 'csv') or not isinstance(data, str):
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': 'format (ndjson or csv) and data required'})
+        }
+    
+    try:
+        rows, errors = parse_import_rows(data, import_format)
+    except csv.Error as e:
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': f'Invalid CSV: {e}'})
+        }
+    
+    conn = get_db_connection()
+    cur = conn.cursor()
+    
+    try:
+        cur.execute("""
+            CREATE TEMP TABLE events_import (
+                row_no INTEGER PRIMARY KEY,
+                title TEXT, type TEXT, date TEXT, time TEXT, end_time TEXT, end_date TEXT,
+                location TEXT, vks_link TEXT, description TEXT, status TEXT, region_name TEXT,
+                is_multi_day TEXT, responsible TEXT, reminders TEXT,
+                event_id INTEGER
+            ) ON COMMIT DROP
+        """)
+        
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        cur.copy_expert("""
+            COPY events_import (row_no, title, type, date, time, end_time, end_date, location,
+                                vks_link, description, status, region_name, is_multi_day,
+                                responsible, reminders)
+            FROM STDIN WITH (FORMAT csv)
+        """, buffer)
+        
+        # Все проверки одним запросом по всей промежуточной таблице. Они повторяют
+        # ограничения events, чтобы одна плохая строка не обрывала весь INSERT
+        cur.execute("""
+            SELECT row_no, errors FROM (
+                SELECT s.row_no, array_remove(ARRAY[
+                    CASE WHEN NULLIF(btrim(s.title), '') IS NULL THEN 'title is required' END,
+                    CASE WHEN length(btrim(s.title)) > 500 THEN 'title is longer than 500 characters' END,
+                    CASE WHEN length(s.location) > 500 THEN 'location is longer than 500 characters' END,
+                    CASE WHEN length(s.region_name) > 255 THEN 'regionName is longer than 255 characters' END,
+                    CASE WHEN s.type IS NULL OR s.type <> ALL(%s) THEN 'invalid type' END,
+                    CASE WHEN try_cast_date(s.date) IS NULL THEN 'invalid date' END,
+                    CASE WHEN s.time IS NOT NULL AND try_cast_time(s.time) IS NULL THEN 'invalid time' END,
+                    CASE WHEN s.end_time IS NOT NULL AND try_cast_time(s.end_time) IS NULL THEN 'invalid endTime' END,
+                    CASE WHEN s.end_date IS NOT NULL AND try_cast_date(s.end_date) IS NULL THEN 'invalid endDate' END,
+                    CASE WHEN try_cast_date(s.end_date) < try_cast_date(s.date) THEN 'endDate is before date' END,
+                    CASE WHEN s.status IS NOT NULL AND s.status <> ALL(%s) THEN 'invalid status' END,
+                    CASE WHEN s.is_multi_day IS NOT NULL
+                          AND lower(s.is_multi_day) NOT IN ('true', 'false', '1', '0') THEN 'invalid isMultiDay' END,
+                    CASE WHEN EXISTS (
+                        SELECT 1 FROM json_array_elements_text(s.responsible::json) AS r(user_id)
+                        WHERE NOT EXISTS (SELECT 1 FROM users u WHERE u.id::text = r.user_id)
+                    ) THEN 'unknown responsible user' END,
+                    CASE WHEN EXISTS (
+                        SELECT 1 FROM json_array_elements_text(s.reminders::json) AS m(reminder_text)
+                        WHERE length(m.reminder_text) > 255
+                    ) THEN 'reminder is longer than 255 characters' END
+                ], NULL) AS errors
+                FROM events_import s
+            ) checked
+            WHERE cardinality(errors) > 0
+            ORDER BY row_no
+        """, (list(EVENT_TYPES), list(ACTIVE_STATUSES + ARCHIVE_STATUSES)))
+        
+        invalid = cur.fetchall()
+        errors = sorted(errors + [{'row': r[0], 'errors': r[1]} for r in invalid], key=lambda e: e['row'])
+        
+        if atomic and errors:
+            conn.rollback()
+            cur.close()
+            conn.close()
+            return {
+                'statusCode': 400,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps({'imported': 0, 'errors': errors})
+            }
+        
+        cur.execute("DELETE FROM events_import WHERE row_no = ANY(%s)", ([r[0] for r in invalid],))
+        
+        # id выдаются заранее, чтобы связать строки импорта с событиями без поиска
+        cur.execute("UPDATE events_import SET event_id = nextval('events_id_seq')")
+        
+        cur.execute("""
+            INSERT INTO events (id, title, type, date, time, end_time, end_date, location, vks_link,
+                                description, status, region_name, is_multi_day, created_by)
+            SELECT event_id, btrim(title), type, date::date, COALESCE(time::time, '00:00'),
+                   end_time::time, end_date::date, location, vks_link, description,
+                   COALESCE(status, 'scheduled'), region_name,
+                   COALESCE(lower(is_multi_day) IN ('true', '1'), FALSE), %s
+            FROM events_import
+            ORDER BY row_no
+        """, (user['user_id'],))
+        imported = cur.rowcount
+        
+        cur.execute("""
+            INSERT INTO event_responsible (event_id, user_id)
+            SELECT DISTINCT s.event_id, r.user_id::integer
+            FROM events_import s, json_array_elements_text(s.responsible::json) AS r(user_id)
+        """)
+        
+        cur.execute("""
+            INSERT INTO event_reminders (event_id, reminder_text)
+            SELECT s.event_id, r.reminder_text
+            FROM events_import s,
+                 json_array_elements_text(s.reminders::json) WITH ORDINALITY AS r(reminder_text, position)
+            ORDER BY s.row_no, r.position
+        """)
+        
+        cur.execute("SELECT row_no, event_id FROM events_import ORDER BY row_no")
+        created = [{'row': r[0], 'id': r[1]} for r in cur.fetchall()]
+        
+        conn.commit()
+        cur.close()
+        conn.close()
+        
+        return {
+            'statusCode': 200,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'imported': imported, 'created': created, 'errors': errors})
+        }
+    except Exception as e:
+        conn.rollback()
+        cur.close()
+        conn.close()
+        
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': str(e)})
+        }
+
+
+def handle_wait_changes(params: Dict[str, str]) -> Dict[str, Any]:
+    _change_hub.start()
+    
+    # nan прошёл бы через min() и повесил бы ожидание навсегда
+    try:
+        timeout = float(params.get('timeout', CHANGES_WAIT_SECONDS))
+    except ValueError:
+        timeout = CHANGES_WAIT_SECONDS
+    if not math.isfinite(timeout):
+        timeout = CHANGES_WAIT_SECONDS
+    timeout = max(0.0, min(timeout, CHANGES_WAIT_SECONDS))
+    
+    cursor = params.get('cursor', '')
+    valid = cursor.isdigit() and int(cursor) > 0
+    reset = bool(cursor) and not valid
+    
+    if valid:
+        result = _change_hub.wait(int(cursor), timeout)
+    else:
+        with _change_hub.condition:
+            result = (_change_hub.horizon, []) if _change_hub.horizon else None
+    
+    if result is None:
+        # Без курсора клиент только подписывается и получает текущую границу.
+        # Курсор старше буфера контейнера — один запрос к журналу; если нужные строки
+        # уже удалены или курсор некорректен, клиент перечитывает данные целиком
+        conn = get_db_connection()
+        conn.autocommit = True
+        cur = conn.cursor()
+        
+        try:
+            if valid:
+                horizon, pruned_through, changes = read_changes(cur, int(cursor))
+                reset = int(cursor) < pruned_through
+                ids = [] if reset else sorted({event_id for _, event_id in changes})
+                result = max(int(cursor), horizon), ids
+            else:
+                result = current_change_horizon(cur), []
+            
+            cur.close()
+            conn.close()
+        except Exception as e:
+            cur.close()
+            conn.close()
+            
+            return {
+                'statusCode': 400,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps({'error': str(e)})
+            }
+    
+    next_cursor, ids = result
+    
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'body': json.dumps({'cursor': str(next_cursor), 'ids': [str(i) for i in ids], 'reset': reset})
+    }
+
+
+def handle_calendar(params: Dict[str, str], conn) -> Dict[str, Any]:
+    # Окно задаётся month=YYYY-MM или парой from/to (включительно)
+    try:
+        if params.get('month'):
+            start = date.fromisoformat(params['month'] + '-01')
+            end = (start.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+        else:
+            start = date.fromisoformat(params['from'])
+            end = date.fromisoformat(params['to'])
+    except (KeyError, ValueError):
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': 'month (YYYY-MM) or from/to (YYYY-MM-DD) required'})
+        }
+    
+    if end < start or (end - start).days + 1 > CALENDAR_MAX_DAYS:
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': f'Range must be 1..{CALENDAR_MAX_DAYS} days'})
+        }
+    
+    scope = params.get('scope', 'active')
+    if scope not in EVENT_SCOPES:
+        scope = 'active'
+    counts_only = params.get('detail') == 'counts'
+    
+    cur = conn.cursor()
+    # Отпечаток окна — число событий и хэш их id и версий, тем же индексом, что и сама
+    # выборка. Любая правка события меняет его version, поэтому устаревшие ключи
+    # просто вытесняются; общего счётчика, который блокировал бы записи, нет
+    execute_prepared(cur, f'calendar_fingerprint_{scope}', (start, end))
+    version = cur.fetchone()[0]
+    
+    cache_key = (start, end, scope, counts_only, version)
+    # Кэш общий для параллельных запросов контейнера: чтение с переносом в конец
+    # и вставка с вытеснением выполняются под блокировкой
+    with _calendar_cache_lock:
+        body = _calendar_cache.get(cache_key)
+        if body is not None:
+            _calendar_cache.move_to_end(cache_key)
+    
+    if body is None:
+        execute_prepared(cur, f'calendar_days_{scope}', (start, end))
+        
+        days: Dict[str, List[Dict[str, Any]]] = {}
+        counts: Dict[str, int] = {}
+        for row in cur.fetchall():
+            day = row[0].isoformat()
+            counts[day] = counts.get(day, 0) + 1
+            if counts_only:
+                continue
+            days.setdefault(day, []).append({
+                'id': str(row[1]),
+                'title': row[2],
+                'type': row[3],
+                'date': row[4].isoformat(),
+                'time': str(row[5]) if row[5] else None,
+                'endTime': str(row[6]) if row[6] else None,
+                'endDate': row[7].isoformat() if row[7] else None,
+                'status': row[8],
+                'regionName': row[9],
+                'isMultiDay': row[10],
+                'location': row[11]
+            })
+        
+        result = {'from': start.isoformat(), 'to': end.isoformat(), 'version': version, 'counts': counts}
+        if not counts_only:
+            result['days'] = days
+        body = json.dumps(result)
+        
+        with _calendar_cache_lock:
+            _calendar_cache[cache_key] = body
+            while len(_calendar_cache) > CALENDAR_CACHE_SIZE:
+                _calendar_cache.popitem(last=False)
+    
+    cur.close()
+    
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'body': body
+    }
+
+
+def serialize_booking(row) -> Dict[str, Any]:
+    return {
+        'id': str(row[0]),
+        'title': row[1],
+        'description': row[2],
+        'date': row[3].date().isoformat(),
+        'time': row[3].strftime('%H:%M'),
+        'endTime': row[4].strftime('%H:%M'),
+        'status': row[5],
+        'createdAt': row[6].isoformat() if row[6] else None,
+        'approvedAt': row[7].isoformat() if row[7] else None,
+        'requestedBy': {'id': str(row[8]), 'name': row[9], 'position': row[10]},
+        'approvedBy': row[11],
+        'eventId': str(row[12]) if row[12] else None
+    }
+
+def handle_get_bookings(params: Dict[str, str], user: Dict[str, Any]) -> Dict[str, Any]:
+    status = params.get('status', 'pending')
+    
+    conn = get_db_connection()
+    cur = conn.cursor()
+    
+    # Администратор видит все заявки, остальные — только свои
+    cur.execute(BOOKING_SELECT + """
+        WHERE (%s = 'all' OR b.status = %s)
+          AND (%s OR b.requested_by = %s)
+        ORDER BY lower(b.slot)
+    """, (status, status, user.get('role') == 'admin', user['user_id']))
+    
+    bookings = [serialize_booking(row) for row in cur.fetchall()]
+    
+    cur.close()
+    conn.close()
+    
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'body': json.dumps({'bookings': bookings})
+    }
+
+def handle_submit_booking(body_data: Dict[str, Any], user: Dict[str, Any]) -> Dict[str, Any]:
+    from datetime import datetime
+    
+    try:
+        start = datetime.fromisoformat(f"{body_data['date']}T{body_data['time']}")
+        end = datetime.fromisoformat(f"{body_data['date']}T{body_data['endTime']}")
+    except (KeyError, TypeError, ValueError):
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': 'date, time and endTime required'})
+        }
+    
+    if not body_data.get('title') or end <= start:
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': 'Title required and endTime must be after time'})
+        }
+    
+    conn = get_db_connection()
+    cur = conn.cursor()
+    
+    try:
+        # Ранний отказ, если время уже занято одобренной заявкой (поиск по GiST-индексу)
+        cur.execute("""
+            SELECT 1 FROM booking_requests
+            WHERE status = 'approved' AND slot && tsrange(%s, %s, '[)')
+            LIMIT 1
+        """, (start, end))
+        if cur.fetchone():
+            conn.rollback()
+            cur.close()
+            conn.close()
+            return {
+                'statusCode': 409,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json.dumps({'error': 'Time slot already booked'})
+            }
+        
+        cur.execute("""
+            INSERT INTO booking_requests (requested_by, title, description, slot)
+            VALUES (%s, %s, %s, tsrange(%s, %s, '[)'))
+            RETURNING id
+        """, (user['user_id'], body_data['title'], body_data.get('description') or None, start, end))
+        booking_id = cur.fetchone()[0]
+        
+        cur.execute(BOOKING_SELECT + " WHERE b.id = %s", (booking_id,))
+        booking = serialize_booking(cur.fetchone())
+        
+        conn.commit()
+        cur.close()
+        conn.close()
+        
+        return {
+            'statusCode': 201,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps(booking)
+        }
+    except Exception as e:
+        conn.rollback()
+        cur.close()
+        conn.close()
+        
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': str(e)})
+        }
+
+def approve_bookings(cur, booking_ids: List[int], user: Dict[str, Any]) -> List[int]:
+    # id событий выдаются сразу при одобрении, чтобы связать заявку и событие без поиска.
+    # Пересечение с уже одобренной заявкой отклоняет весь оператор (booking_requests_no_overlap)
+    cur.execute("""
+        UPDATE booking_requests
+        SET status = 'approved', approved_by = %s, approved_at = CURRENT_TIMESTAMP,
+            event_id = nextval('events_id_seq')
+        WHERE id = ANY(%s) AND status = 'pending'
+        RETURNING id
+    """, (user['user_id'], booking_ids))
+    approved = [r[0] for r in cur.fetchall()]
+    
+    if approved:
+        cur.execute("""
+            INSERT INTO events (id, title, type, date, time, end_time, end_date, description,
+                                status, is_multi_day, created_by)
+            SELECT event_id, title, 'meeting', lower(slot)::date, lower(slot)::time, upper(slot)::time,
+                   CASE WHEN upper(slot)::date > lower(slot)::date THEN upper(slot)::date END,
+                   description, 'scheduled', upper(slot)::date > lower(slot)::date, approved_by
+            FROM booking_requests
+            WHERE id = ANY(%s)
+        """, (approved,))
+        cur.execute("""
+            INSERT INTO event_responsible (event_id, user_id)
+            SELECT event_id, requested_by FROM booking_requests WHERE id = ANY(%s)
+        """, (approved,))
+    
+    return approved
+
+def handle_review_bookings(body_data: Dict[str, Any], user: Dict[str, Any]) -> Dict[str, Any]:
+    import psycopg2.errors
+    
+    if user.get('role') != 'admin':
+        return {
+            'statusCode': 403,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': 'Only admin can review bookings'})
+        }
+    
+    try:
+        booking_ids = [int(i) for i in body_data.get('ids') or []]
+    except (TypeError, ValueError):
+        booking_ids = []
+    if not booking_ids:
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': 'Booking ids required'})
+        }
+    
+    atomic = body_data.get('atomic', True)
+    
+    conn = get_db_connection()
+    cur = conn.cursor()
+    
+    try:
+        results: Dict[int, str] = {}
+        
+        if body_data['action'] == 'booking_reject':
+            cur.execute("""
+                UPDATE booking_requests SET status = 'rejected'
+                WHERE id = ANY(%s) AND status = 'pending'
+                RETURNING id
+            """, (booking_ids,))
+            results.update({r[0]: 'rejected' for r in cur.fetchall()})
+        else:
+            cur.execute("SAVEPOINT approve_all")
+            try:
+                results.update({i: 'approved' for i in approve_bookings(cur, booking_ids, user)})
+                cur.execute("RELEASE SAVEPOINT approve_all")
+            except psycopg2.errors.ExclusionViolation:
+                cur.execute("ROLLBACK TO SAVEPOINT approve_all")
+                if atomic:
+                    conn.rollback()
+                    cur.close()
+                    conn.close()
+                    return {
+                        'statusCode': 409,
+                        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                        'body': json.dumps({'error': 'Booking overlaps an approved booking'})
+                    }
+                # Без атомарности одобряем по одной, пропуская пересекающиеся
+                for booking_id in booking_ids:
+                    cur.execute("SAVEPOINT approve_one")
+                    try:
+                        results.update({i: 'approved' for i in approve_bookings(cur, [booking_id], user)})
+                        cur.execute("RELEASE SAVEPOINT approve_one")
+                    except psycopg2.errors.ExclusionViolation:
+                        cur.execute("ROLLBACK TO SAVEPOINT approve_one")
+                        results[booking_id] = 'conflict'
+        
+        conn.commit()
+        cur.close()
+        conn.close()
+        
+        return {
+            'statusCode': 200,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({
+                'results': [{'id': str(i), 'status': results.get(i, 'not_pending')} for i in booking_ids]
+            })
+        }
+    except Exception as e:
+        conn.rollback()
+        cur.close()
+        conn.close()
+        
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': str(e)})
+        }
+
+
+def refresh_user_snapshot(user_id: int) -> str:
+    conn = get_db_connection()
+    conn.autocommit = True
+    cur = conn.cursor()
+    
+    try:
+        # Строка снимка должна существовать до чтения данных: иначе изменение,
+        # пришедшее во время пересборки, не увеличит generation и потеряется
+        cur.execute("""
+            INSERT INTO user_schedule_snapshots (user_id) VALUES (%s)
+            ON CONFLICT (user_id) DO NOTHING
+        """, (user_id,))
+        
+        conn.autocommit = False
+        cur.execute("SELECT generation, CURRENT_DATE FROM user_schedule_snapshots WHERE user_id = %s", (user_id,))
+        generation, window_start = cur.fetchone()
+        
+        cur.execute("""
+            SELECT e.id, e.title, e.type, e.date, e.time, e.end_time, e.end_date,
+                   e.location, e.vks_link, e.status, e.region_name, e.is_multi_day,
+                   COALESCE(r.responsible, '[]'::json)
+            FROM event_responsible mine
+            JOIN events e ON e.id = mine.event_id
+            LEFT JOIN LATERAL (
+                SELECT json_agg(json_build_object('id', u.id, 'name', u.full_name, 'position', u.position)
+                                ORDER BY u.full_name) AS responsible
+                FROM event_responsible er
+                JOIN users u ON u.id = er.user_id
+                WHERE er.event_id = e.id
+            ) r ON TRUE
+            WHERE mine.user_id = %s
+              AND e.status IN %s
+              AND daterange(e.date, GREATEST(COALESCE(e.end_date, e.date), e.date), '[]')
+                  && daterange(CURRENT_DATE, CURRENT_DATE + %s, '[)')
+            ORDER BY e.date, e.time
+        """, (user_id, ACTIVE_STATUSES, SNAPSHOT_DAYS))
+        rows = cur.fetchall()
+        
+        document = json.dumps({
+            'from': window_start.isoformat(),
+            'to': (window_start + timedelta(days=SNAPSHOT_DAYS - 1)).isoformat(),
+            'events': [{
+                'id': str(row[0]),
+                'title': row[1],
+                'type': row[2],
+                'date': row[3].isoformat(),
+                'time': str(row[4]) if row[4] else None,
+                'endTime': str(row[5]) if row[5] else None,
+                'endDate': row[6].isoformat() if row[6] else None,
+                'location': row[7],
+                'vksLink': row[8],
+                'status': row[9],
+                'regionName': row[10],
+                'isMultiDay': row[11],
+                'responsible': row[12]
+            } for row in rows]
+        })
+        
+        cur.execute("""
+            UPDATE user_schedule_snapshots
+            SET document = %s, window_start = %s, built_generation = %s, refreshed_at = CURRENT_TIMESTAMP
+            WHERE user_id = %s
+        """, (document, window_start, generation, user_id))
+        
+        conn.commit()
+        return document
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+def handle_my_schedule(user: Dict[str, Any], conn) -> Dict[str, Any]:
+    user_id = int(user['user_id'])
+    
+    cur = conn.cursor()
+    execute_prepared(cur, 'user_schedule_snapshot', (user_id,))
+    row = cur.fetchone()
+    cur.close()
+    
+    # Актуальный снимок отдаётся как есть, без запросов к событиям и сериализации
+    if row and row[0] is not None and row[1]:
+        _snapshot_stats['hits'] += 1
+        return {
+            'statusCode': 200,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Expose-Headers': 'X-Snapshot',
+                'X-Snapshot': 'hit'
+            },
+            'body': row[0]
+        }
+    
+    started = time.perf_counter()
+    try:
+        document = refresh_user_snapshot(user_id)
+    except Exception as e:
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': str(e)})
+        }
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    
+    _snapshot_stats['misses'] += 1
+    _snapshot_stats['refresh_ms_total'] += elapsed_ms
+    _snapshot_stats['refresh_ms_last'] = elapsed_ms
+    
+    return {
+        'statusCode': 200,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Expose-Headers': 'X-Snapshot',
+            'X-Snapshot': 'miss'
+        },
+        'body': document
+    }
+
+def handle_snapshot_stats(user: Dict[str, Any]) -> Dict[str, Any]:
+    if user.get('role') != 'admin':
+        return {
+            'statusCode': 403,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': 'Admin access required'})
+        }
+    
+    requests_total = _snapshot_stats['hits'] + _snapshot_stats['misses']
+    
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'body': json.dumps({
+            'hits': _snapshot_stats['hits'],
+            'misses': _snapshot_stats['misses'],
+            'hitRate': _snapshot_stats['hits'] / requests_total if requests_total else None,
+            'refreshMsAvg': _snapshot_stats['refresh_ms_total'] / _snapshot_stats['misses']
+                            if _snapshot_stats['misses'] else None,
+            'refreshMsLast': _snapshot_stats['refresh_ms_last']
+        })
+    }
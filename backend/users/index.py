@@ -7,14 +7,148 @@ Returns: HTTP response со списком пользователей или р
 
 import json
 import os
+import re
 import jwt
 from typing import Dict, Any, Optional
 
-def get_db_connection():
+# Горячие запросы чтения: готовятся один раз на соединение через PREPARE и
+# дальше выполняются через EXECUTE без повторного разбора и планирования
+PREPARED_STATEMENTS = {
+    'users_list': ('', """
+        SELECT id, login, email, full_name, position, role, created_at
+        FROM users
+        ORDER BY role DESC, full_name
+    """),
+}
+
+# Реплики для чтения (через запятую); без них всё читается с основного сервера
+REPLICA_DSNS = [dsn.strip() for dsn in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if dsn.strip()]
+REPLICA_MAX_LAG_SECONDS = float(os.environ.get('REPLICA_MAX_LAG_SECONDS', '5'))
+
+# Формат pg_lsn: две шестнадцатеричные половины через "/"; заголовок другого вида
+# игнорируется, иначе приведение ::pg_lsn падало бы на каждой проверке реплики
+LSN_PATTERN = re.compile(r'^[0-9A-Fa-f]{1,8}/[0-9A-Fa-f]{1,8}$')
+
+# Соединения для чтения переживают вызовы в рамках одного тёплого контейнера;
+# подготовленные запросы учитываются отдельно для каждого соединения
+_read_conns: Dict[str, Any] = {}
+_prepared: Dict[int, set] = {}
+
+def get_db_connection(dsn: Optional[str] = None):
     import psycopg2
-    dsn = os.environ.get('DATABASE_URL')
+    dsn = dsn or os.environ.get('DATABASE_URL')
     return psycopg2.connect(dsn)
 
+def get_cached_connection(dsn: str):
+    conn = _read_conns.get(dsn)
+    if conn is None or conn.closed:
+        conn = get_db_connection(dsn)
+        conn.autocommit = True
+        _read_conns[dsn] = conn
+        _prepared[id(conn)] = set()
+    return conn
+
+def drop_cached_connection(dsn: str):
+    conn = _read_conns.pop(dsn, None)
+    if conn is not None:
+        _prepared.pop(id(conn), None)
+        if not conn.closed:
+            conn.close()
+
+def replica_is_fresh(conn, min_lsn: Optional[str]) -> bool:
+    cur = conn.cursor()
+    # Весь полученный WAL применён — отставание равно давности последнего сообщения
+    # от основного сервера (он шлёт keepalive и при простое). Иначе — давности
+    # последней применённой транзакции. Реплика без потоковой репликации не годится:
+    # у отключённого приёмника полученный и применённый WAL тоже совпадают.
+    # Статус приёмника виден только с ролью pg_read_all_stats (pg_monitor), без неё
+    # он NULL и чтение уходит на основной сервер
+    cur.execute("""
+        SELECT pg_is_in_recovery(),
+               COALESCE(w.status = 'streaming', FALSE),
+               CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn()
+                    THEN EXTRACT(EPOCH FROM now() - w.last_msg_receipt_time)
+                    ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+               END,
+               %s::pg_lsn IS NULL OR pg_last_wal_replay_lsn() >= %s::pg_lsn
+        FROM (SELECT 1) AS one
+        LEFT JOIN pg_stat_wal_receiver w ON TRUE
+    """, (min_lsn, min_lsn))
+    in_recovery, streaming, lag, caught_up = cur.fetchone()
+    cur.close()
+    return bool(in_recovery and streaming and lag is not None
+                and lag <= REPLICA_MAX_LAG_SECONDS and caught_up)
+
+def get_read_dsn(min_lsn: Optional[str] = None) -> str:
+    import psycopg2
+    
+    # Реплика подходит, если она жива, не отстаёт и уже видит последнюю запись клиента
+    for dsn in REPLICA_DSNS:
+        try:
+            if replica_is_fresh(get_cached_connection(dsn), min_lsn):
+                return dsn
+        except psycopg2.Error:
+            drop_cached_connection(dsn)
+    return os.environ.get('DATABASE_URL')
+
+def get_read_connection(min_lsn: Optional[str] = None):
+    return get_cached_connection(get_read_dsn(min_lsn))
+
+def reset_read_connections():
+    for dsn in list(_read_conns):
+        drop_cached_connection(dsn)
+
+def get_min_lsn(headers: Dict[str, str]) -> Optional[str]:
+    value = (headers.get('x-min-lsn') or headers.get('X-Min-LSN') or '').strip()
+    return value if LSN_PATTERN.match(value) else None
+
+def get_write_lsn() -> Optional[str]:
+    import psycopg2
+    
+    # Позиция WAL после коммита: клиент передаёт её в X-Min-LSN при следующих чтениях
+    try:
+        cur = get_cached_connection(os.environ.get('DATABASE_URL')).cursor()
+        cur.execute("SELECT pg_current_wal_lsn()::text")
+        lsn = cur.fetchone()[0]
+        cur.close()
+        return lsn
+    except psycopg2.Error:
+        drop_cached_connection(os.environ.get('DATABASE_URL'))
+        return None
+
+def execute_prepared(cur, name: str, params: tuple):
+    import psycopg2
+    import psycopg2.errorcodes
+    
+    param_types, sql = PREPARED_STATEMENTS[name]
+    prepared = _prepared.setdefault(id(cur.connection), set())
+    arguments = f" ({', '.join(['%s'] * len(params))})" if params else ''
+    
+    for attempt in range(2):
+        try:
+            if name not in prepared:
+                try:
+                    cur.execute(f"PREPARE {name} {param_types} AS {sql}")
+                except psycopg2.Error as e:
+                    # Пулер выдал сессию, где запрос уже подготовлен — используем его
+                    if e.pgcode != psycopg2.errorcodes.DUPLICATE_PREPARED_STATEMENT:
+                        raise
+                prepared.add(name)
+            cur.execute(f"EXECUTE {name}{arguments}", params)
+            return
+        except psycopg2.Error as e:
+            if attempt == 1:
+                raise
+            if e.pgcode == psycopg2.errorcodes.INVALID_SQL_STATEMENT_NAME:
+                # Сессия сброшена (DISCARD ALL у пулера) — готовим заново
+                prepared.discard(name)
+            elif e.pgcode == psycopg2.errorcodes.FEATURE_NOT_SUPPORTED:
+                # "cached plan must not change result type" после изменения схемы
+                cur.execute(f"DEALLOCATE {name}")
+                prepared.discard(name)
+            else:
+                raise
+
 def verify_token(headers: Dict[str, str]) -> Optional[Dict[str, Any]]:
     token = headers.get('x-auth-token') or headers.get('X-Auth-Token')
     if not token:
@@ -36,7 +170,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'headers': {
                 'Access-Control-Allow-Origin': '*',
                 'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-Auth-Token',
+                'Access-Control-Allow-Headers': 'Content-Type, X-Auth-Token, X-Min-LSN',
                 'Access-Control-Max-Age': '86400'
             },
             'body': ''
@@ -51,31 +185,32 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         }
     
     if method == 'GET':
-        return handle_get_users(user)
-    elif method == 'POST':
-        if user.get('role') != 'admin':
-            return {
-                'statusCode': 403,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Admin access required'})
-            }
-        return handle_create_user(event)
+        return handle_get_users(user, get_min_lsn(event.get('headers') or {}))
+    
+    if method in ('POST', 'PUT', 'DELETE') and user.get('role') != 'admin':
+        return {
+            'statusCode': 403,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': 'Admin access required'})
+        }
+    
+    if method == 'POST':
+        response = handle_create_user(event)
     elif method == 'PUT':
-        if user.get('role') != 'admin':
-            return {
-                'statusCode': 403,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Admin access required'})
-            }
-        return handle_update_user(event)
+        response = handle_update_user(event)
     elif method == 'DELETE':
-        if user.get('role') != 'admin':
-            return {
-                'statusCode': 403,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Admin access required'})
-            }
-        return handle_delete_user(event)
+        response = handle_delete_user(event)
+    else:
+        response = None
+    
+    if response is not None:
+        # После записи сообщаем клиенту позицию WAL для чтения своих записей с реплик
+        response['headers']['Access-Control-Expose-Headers'] = 'X-Write-LSN'
+        if REPLICA_DSNS and response['statusCode'] < 400:
+            write_lsn = get_write_lsn()
+            if write_lsn:
+                response['headers']['X-Write-LSN'] = write_lsn
+        return response
     
     return {
         'statusCode': 405,
@@ -83,15 +218,20 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         'body': json.dumps({'error': 'Method not allowed'})
     }
 
-def handle_get_users(user: Dict[str, Any]) -> Dict[str, Any]:
-    conn = get_db_connection()
+def handle_get_users(user: Dict[str, Any], min_lsn: Optional[str] = None) -> Dict[str, Any]:
+    import psycopg2
+    
+    try:
+        return _get_users(get_read_connection(min_lsn))
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        # Соединение оборвалось между вызовами — переподключаемся один раз
+        reset_read_connections()
+        return _get_users(get_read_connection(min_lsn))
+
+def _get_users(conn) -> Dict[str, Any]:
     cur = conn.cursor()
     
-    cur.execute("""
-        SELECT id, login, email, full_name, position, role, created_at
-        FROM users
-        ORDER BY role DESC, full_name
-    """)
+    execute_prepared(cur, 'users_list', ())
     
     users_list = []
     for row in cur.fetchall():
@@ -106,7 +246,6 @@ def handle_get_users(user: Dict[str, Any]) -> Dict[str, Any]:
         })
     
     cur.close()
-    conn.close()
     
     return {
         'statusCode': 200,
@@ -0,0 +1,105 @@
+-- Разделение событий на активный и архивный уровни через партиционирование по статусу.
+-- Основная вкладка работает только с активной секцией, история не раздувает её индексы.
+-- Перевод события в архив — это перенос строки между секциями одним UPDATE status.
+
+-- Внешние ключи на партиционированную таблицу требуют status в ключе,
+-- поэтому связь дочерних таблиц с events поддерживается триггерами ниже
+ALTER TABLE event_responsible DROP CONSTRAINT IF EXISTS event_responsible_event_id_fkey;
+ALTER TABLE event_reminders DROP CONSTRAINT IF EXISTS event_reminders_event_id_fkey;
+
+ALTER TABLE events RENAME TO events_legacy;
+ALTER INDEX IF EXISTS events_pkey RENAME TO events_legacy_pkey;
+
+CREATE TABLE events (
+    id INTEGER NOT NULL DEFAULT nextval('events_id_seq'),
+    title VARCHAR(500) NOT NULL,
+    type VARCHAR(50) NOT NULL,
+    date DATE NOT NULL,
+    time TIME NOT NULL DEFAULT '00:00',
+    end_time TIME,
+    location VARCHAR(500),
+    vks_link TEXT,
+    description TEXT,
+    status VARCHAR(50) NOT NULL DEFAULT 'scheduled',
+    created_by INTEGER REFERENCES users(id),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    end_date DATE,
+    region_name VARCHAR(255),
+    is_multi_day BOOLEAN DEFAULT FALSE,
+    PRIMARY KEY (id, status),
+    CONSTRAINT events_type_check
+        CHECK (type IN ('meeting', 'vks', 'hearing', 'committee', 'visit', 'reception', 'regional-trip')),
+    CONSTRAINT events_status_check
+        CHECK (status IN ('scheduled', 'in-progress', 'completed', 'cancelled', 'archived', 'pending'))
+) PARTITION BY LIST (status);
+
+-- Активный уровень: всё, что показывается на основной вкладке
+CREATE TABLE events_active PARTITION OF events
+    FOR VALUES IN ('scheduled', 'in-progress', 'pending');
+
+-- Архивный уровень: завершённые, отменённые и архивированные события
+CREATE TABLE events_archive PARTITION OF events
+    FOR VALUES IN ('completed', 'cancelled', 'archived');
+
+INSERT INTO events (id, title, type, date, time, end_time, location, vks_link, description,
+                    status, created_by, created_at, updated_at, end_date, region_name, is_multi_day)
+SELECT id, title, type, date, time, end_time, location, vks_link, description,
+       status, created_by, created_at, updated_at, end_date, region_name, is_multi_day
+FROM events_legacy;
+
+-- Последовательность должна пережить удаление старой таблицы
+ALTER SEQUENCE events_id_seq OWNED BY events.id;
+
+DROP TABLE events_legacy;
+
+-- id уникален внутри каждой секции; между секциями его гарантирует последовательность
+CREATE UNIQUE INDEX IF NOT EXISTS idx_events_active_id ON events_active(id);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_events_archive_id ON events_archive(id);
+
+CREATE INDEX IF NOT EXISTS idx_events_date ON events(date);
+CREATE INDEX IF NOT EXISTS idx_events_status ON events(status);
+CREATE INDEX IF NOT EXISTS idx_events_type ON events(type);
+CREATE INDEX IF NOT EXISTS idx_event_reminders_event ON event_reminders(event_id);
+
+-- Удаление события каскадно удаляет ответственных и напоминания.
+-- Перенос между секциями выполняется как DELETE + INSERT, поэтому
+-- дочерние строки удаляются только если события больше нет ни в одной секции.
+CREATE OR REPLACE FUNCTION events_cascade_delete() RETURNS TRIGGER AS $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM events WHERE id = OLD.id) THEN
+        DELETE FROM event_responsible WHERE event_id = OLD.id;
+        DELETE FROM event_reminders WHERE event_id = OLD.id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_events_active_cascade_delete
+    AFTER DELETE ON events_active
+    FOR EACH ROW EXECUTE FUNCTION events_cascade_delete();
+
+CREATE TRIGGER trg_events_archive_cascade_delete
+    AFTER DELETE ON events_archive
+    FOR EACH ROW EXECUTE FUNCTION events_cascade_delete();
+
+-- Замена внешнего ключа: дочерние строки можно добавить только к существующему событию.
+-- FOR KEY SHARE, как и настоящий FK, не даёт параллельно удалить событие до коммита
+CREATE OR REPLACE FUNCTION event_child_check_event() RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM 1 FROM events WHERE id = NEW.event_id FOR KEY SHARE;
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'Event % does not exist', NEW.event_id
+            USING ERRCODE = 'foreign_key_violation';
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_event_responsible_check_event
+    BEFORE INSERT OR UPDATE OF event_id ON event_responsible
+    FOR EACH ROW EXECUTE FUNCTION event_child_check_event();
+
+CREATE TRIGGER trg_event_reminders_check_event
+    BEFORE INSERT OR UPDATE OF event_id ON event_reminders
+    FOR EACH ROW EXECUTE FUNCTION event_child_check_event();
@@ -0,0 +1,3 @@
+-- Версия события для оптимистичной блокировки (If-Match / PATCH)
+-- Каждая запись, меняющая событие, увеличивает version на 1
+ALTER TABLE events ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
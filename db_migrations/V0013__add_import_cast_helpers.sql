@@ -0,0 +1,18 @@
+-- Безопасные приведения типов для проверки строк массового импорта событий:
+-- вместо ошибки на всю загрузку некорректное значение превращается в NULL.
+-- STABLE, а не IMMUTABLE: разбор даты зависит от параметра сеанса DateStyle
+CREATE OR REPLACE FUNCTION try_cast_date(value TEXT) RETURNS DATE AS $$
+BEGIN
+    RETURN value::DATE;
+EXCEPTION WHEN others THEN
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+CREATE OR REPLACE FUNCTION try_cast_time(value TEXT) RETURNS TIME AS $$
+BEGIN
+    RETURN value::TIME;
+EXCEPTION WHEN others THEN
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql STABLE;
@@ -0,0 +1,67 @@
+-- Журнал изменений событий для long-poll (action=changes) и уведомление в канал event_changes.
+-- Каждая строка журнала помечена номером своей транзакции (tx). Курсор клиента — граница
+-- txid_snapshot_xmin: все транзакции с номером ниже неё уже завершились, поэтому новые
+-- строки ниже границы не появятся. Курсор не зависит от контейнера, который его выдал.
+CREATE TABLE IF NOT EXISTS event_changes (
+    id BIGSERIAL PRIMARY KEY,
+    tx BIGINT NOT NULL DEFAULT txid_current(),
+    event_id INTEGER NOT NULL,
+    changed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_event_changes_tx ON event_changes(tx);
+CREATE INDEX IF NOT EXISTS idx_event_changes_changed_at ON event_changes(changed_at);
+
+-- Старые строки журнала удаляются; курсор ниже pruned_through означает, что часть
+-- изменений уже недоступна и клиент должен перечитать данные целиком
+CREATE TABLE IF NOT EXISTS event_changes_horizon (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    pruned_through BIGINT NOT NULL DEFAULT 0
+);
+
+INSERT INTO event_changes_horizon DEFAULT VALUES ON CONFLICT DO NOTHING;
+
+-- Уведомление только будит слушателей; сами изменения читаются из журнала.
+-- Одинаковые уведомления внутри одной транзакции PostgreSQL объединяет сам.
+CREATE OR REPLACE FUNCTION notify_event_change() RETURNS TRIGGER AS $$
+DECLARE
+    changed_id INTEGER;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        changed_id := OLD.id;
+    ELSE
+        changed_id := NEW.id;
+    END IF;
+    INSERT INTO event_changes (event_id) VALUES (changed_id);
+    PERFORM pg_notify('event_changes', changed_id::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Для ответственных и напоминаний записываем id события, к которому они относятся
+CREATE OR REPLACE FUNCTION notify_event_child_change() RETURNS TRIGGER AS $$
+DECLARE
+    changed_id INTEGER;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        changed_id := OLD.event_id;
+    ELSE
+        changed_id := NEW.event_id;
+    END IF;
+    INSERT INTO event_changes (event_id) VALUES (changed_id);
+    PERFORM pg_notify('event_changes', changed_id::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_events_notify
+    AFTER INSERT OR UPDATE OR DELETE ON events
+    FOR EACH ROW EXECUTE FUNCTION notify_event_change();
+
+CREATE TRIGGER trg_event_responsible_notify
+    AFTER INSERT OR UPDATE OR DELETE ON event_responsible
+    FOR EACH ROW EXECUTE FUNCTION notify_event_child_change();
+
+CREATE TRIGGER trg_event_reminders_notify
+    AFTER INSERT OR UPDATE OR DELETE ON event_reminders
+    FOR EACH ROW EXECUTE FUNCTION notify_event_child_change();
@@ -0,0 +1,6 @@
+-- Индекс по диапазону дат события для календаря: многодневные события
+-- находятся пересечением диапазонов, а не перебором всей таблицы.
+-- GREATEST защищает от end_date раньше date: daterange с такими границами
+-- падал бы и при построении индекса, и при каждой вставке
+CREATE INDEX IF NOT EXISTS idx_events_date_span ON events
+    USING gist (daterange(date, GREATEST(COALESCE(end_date, date), date), '[]'));
@@ -0,0 +1,49 @@
+-- Заявки на бронирование времени хранятся на сервере, а не в состоянии браузера.
+-- Одобренные заявки не могут пересекаться по времени: это гарантирует
+-- ограничение исключения по tsrange, поэтому параллельные одобрения не дают двойной брони.
+CREATE TABLE IF NOT EXISTS booking_requests (
+    id SERIAL PRIMARY KEY,
+    requested_by INTEGER NOT NULL REFERENCES users(id),
+    title VARCHAR(500) NOT NULL,
+    description TEXT,
+    slot TSRANGE NOT NULL CHECK (NOT isempty(slot)),
+    status VARCHAR(20) NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'approved', 'rejected', 'released')),
+    event_id INTEGER,
+    approved_by INTEGER REFERENCES users(id),
+    approved_at TIMESTAMP,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT booking_requests_no_overlap
+        EXCLUDE USING gist (slot WITH &&) WHERE (status = 'approved')
+);
+
+CREATE INDEX IF NOT EXISTS idx_booking_requests_pending ON booking_requests(created_at) WHERE status = 'pending';
+CREATE INDEX IF NOT EXISTS idx_booking_requests_requested_by ON booking_requests(requested_by);
+CREATE INDEX IF NOT EXISTS idx_booking_requests_event ON booking_requests(event_id) WHERE status = 'approved';
+
+-- Отмена, архивация или удаление события освобождает время одобренной заявки:
+-- заявка переходит в released и перестаёт участвовать в booking_requests_no_overlap.
+-- Перенос события между секциями может прийти как DELETE + INSERT, поэтому
+-- проверяется итоговое состояние события, а не вид операции
+CREATE OR REPLACE FUNCTION release_event_bookings() RETURNS TRIGGER AS $$
+DECLARE
+    changed_id INTEGER;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        changed_id := OLD.id;
+    ELSE
+        changed_id := NEW.id;
+    END IF;
+    UPDATE booking_requests
+    SET status = 'released'
+    WHERE event_id = changed_id
+      AND status = 'approved'
+      AND NOT EXISTS (
+          SELECT 1 FROM events WHERE id = changed_id AND status NOT IN ('cancelled', 'archived')
+      );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_events_release_bookings
+    AFTER UPDATE OF status OR DELETE ON events
+    FOR EACH ROW EXECUTE FUNCTION release_event_bookings();
@@ -0,0 +1,69 @@
+-- Готовые документы "мой график на две недели" для каждого пользователя.
+-- Изменение события или его ответственных увеличивает generation только у затронутых
+-- пользователей; документ пересобирается при следующем чтении, если built_generation отстал.
+CREATE TABLE IF NOT EXISTS user_schedule_snapshots (
+    user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    document TEXT,
+    window_start DATE,
+    generation BIGINT NOT NULL DEFAULT 1,
+    built_generation BIGINT NOT NULL DEFAULT 0,
+    refreshed_at TIMESTAMP
+);
+
+CREATE OR REPLACE FUNCTION invalidate_snapshots_for_event() RETURNS TRIGGER AS $$
+DECLARE
+    changed_id INTEGER;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        changed_id := OLD.id;
+    ELSE
+        changed_id := NEW.id;
+    END IF;
+    UPDATE user_schedule_snapshots
+    SET generation = generation + 1
+    WHERE user_id IN (SELECT user_id FROM event_responsible WHERE event_id = changed_id);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION invalidate_snapshots_for_responsible() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE user_schedule_snapshots SET generation = generation + 1 WHERE user_id = OLD.user_id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        UPDATE user_schedule_snapshots SET generation = generation + 1 WHERE user_id = NEW.user_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- В документе есть имена и должности ответственных: переименование пользователя
+-- делает устаревшими снимки всех, с кем он делит события (и его собственный)
+CREATE OR REPLACE FUNCTION invalidate_snapshots_for_user() RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE user_schedule_snapshots
+    SET generation = generation + 1
+    WHERE user_id IN (
+        SELECT other.user_id
+        FROM event_responsible mine
+        JOIN event_responsible other ON other.event_id = mine.event_id
+        WHERE mine.user_id = NEW.id
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_events_invalidate_snapshots
+    AFTER INSERT OR UPDATE OR DELETE ON events
+    FOR EACH ROW EXECUTE FUNCTION invalidate_snapshots_for_event();
+
+CREATE TRIGGER trg_event_responsible_invalidate_snapshots
+    AFTER INSERT OR UPDATE OR DELETE ON event_responsible
+    FOR EACH ROW EXECUTE FUNCTION invalidate_snapshots_for_responsible();
+
+CREATE TRIGGER trg_users_invalidate_snapshots
+    AFTER UPDATE OF full_name, position ON users
+    FOR EACH ROW
+    WHEN (OLD.full_name IS DISTINCT FROM NEW.full_name OR OLD.position IS DISTINCT FROM NEW.position)
+    EXECUTE FUNCTION invalidate_snapshots_for_user();
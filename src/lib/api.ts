@@ -12,6 +12,11 @@ export interface User {
   role: 'admin' | 'user';
 }
 
+export type EventBatchOperation =
+  | { op: 'create'; data: any }
+  | { op: 'update'; id: string; data: any; version?: number }
+  | { op: 'delete'; id: string };
+
 export interface AuthResponse {
   token: string;
   user: User;
@@ -19,6 +24,8 @@ export interface AuthResponse {
 
 class ApiClient {
   private token: string | null = null;
+  // Позиция WAL последней записи: чтения с реплик не вернут данные старше неё
+  private minLsn: string | null = null;
 
   constructor() {
     this.token = localStorage.getItem('auth_token');
@@ -48,11 +55,20 @@ class ApiClient {
       headers['X-Auth-Token'] = this.token;
     }
 
+    if (this.minLsn) {
+      headers['X-Min-LSN'] = this.minLsn;
+    }
+
     const response = await fetch(url, {
       ...options,
       headers,
     });
 
+    const writeLsn = response.headers.get('X-Write-LSN');
+    if (writeLsn) {
+      this.minLsn = writeLsn;
+    }
+
     if (!response.ok) {
       const error = await response.json().catch(() => ({ error: 'Request failed' }));
       throw new Error(error.error || 'Request failed');
@@ -81,14 +97,59 @@ class ApiClient {
     this.clearToken();
   }
 
-  async getEvents() {
-    return this.request(API_URLS.events);
+  async getEvents(scope: 'active' | 'archive' | 'all' = 'active') {
+    return this.request(`${API_URLS.events}?scope=${scope}`);
+  }
+
+  async getMySchedule() {
+    return this.request(`${API_URLS.events}?action=my_schedule`);
+  }
+
+  async getCalendar(month: string, detail: 'events' | 'counts' = 'events') {
+    return this.request(`${API_URLS.events}?action=calendar&month=${month}&detail=${detail}`);
   }
 
   async getEvent(id: string) {
     return this.request(`${API_URLS.events}?id=${id}`);
   }
 
+  async exportEvents(format: 'ndjson' | 'csv' = 'ndjson', scope: 'active' | 'archive' | 'all' = 'all') {
+    // Сервер отдаёт экспорт страницами; следующая страница начинается после X-Export-Next
+    const parts: string[] = [];
+    let after = '0';
+    while (after) {
+      const response = await fetch(
+        `${API_URLS.events}?action=export&format=${format}&scope=${scope}&after=${after}`,
+        {
+          headers: {
+            ...(this.token ? { 'X-Auth-Token': this.token } : {}),
+            ...(this.minLsn ? { 'X-Min-LSN': this.minLsn } : {}),
+          },
+        }
+      );
+      if (!response.ok) {
+        const error = await response.json().catch(() => ({ error: 'Request failed' }));
+        throw new Error(error.error || 'Request failed');
+      }
+      parts.push(await response.text());
+      after = response.headers.get('X-Export-Next') || '';
+    }
+    return new Blob(parts, {
+      type: format === 'csv' ? 'text/csv;charset=utf-8' : 'application/x-ndjson',
+    });
+  }
+
+  async importEvents(data: string, format: 'ndjson' | 'csv' = 'ndjson', atomic: boolean = false) {
+    return this.request(API_URLS.events, {
+      method: 'POST',
+      body: JSON.stringify({ action: 'import', format, data, atomic }),
+    });
+  }
+
+  async waitForChanges(cursor: string): Promise<{ cursor: string; ids: string[]; reset: boolean }> {
+    return this.request(`${API_URLS.events}?action=changes&cursor=${encodeURIComponent(cursor)}`);
+  }
+
   async createEvent(event: any) {
     return this.request(API_URLS.events, {
       method: 'POST',
@@ -103,12 +164,52 @@ class ApiClient {
     });
   }
 
+  async patchEvent(id: string, changes: any, version?: number) {
+    return this.request(API_URLS.events, {
+      method: 'PATCH',
+      headers: version !== undefined ? { 'If-Match': `"${version}"` } : {},
+      body: JSON.stringify({ id, ...changes }),
+    });
+  }
+
+  async batchEvents(operations: EventBatchOperation[], atomic: boolean = true) {
+    return this.request(API_URLS.events, {
+      method: 'POST',
+      body: JSON.stringify({ action: 'batch', operations, atomic }),
+    });
+  }
+
   async deleteEvent(id: string) {
     return this.request(`${API_URLS.events}?id=${id}`, {
       method: 'DELETE',
     });
   }
 
+  async getBookings(status: 'pending' | 'approved' | 'rejected' | 'released' | 'all' = 'pending') {
+    return this.request(`${API_URLS.events}?action=bookings&status=${status}`);
+  }
+
+  async submitBooking(booking: { title: string; date: string; time: string; endTime: string; description?: string }) {
+    return this.request(API_URLS.events, {
+      method: 'POST',
+      body: JSON.stringify({ action: 'booking_submit', ...booking }),
+    });
+  }
+
+  async approveBookings(ids: string[], atomic: boolean = true) {
+    return this.request(API_URLS.events, {
+      method: 'POST',
+      body: JSON.stringify({ action: 'booking_approve', ids, atomic }),
+    });
+  }
+
+  async rejectBookings(ids: string[]) {
+    return this.request(API_URLS.events, {
+      method: 'POST',
+      body: JSON.stringify({ action: 'booking_reject', ids }),
+    });
+  }
+
   async getUsers() {
     return this.request(API_URLS.users);
   }
@@ -1,4 +1,4 @@
-import { useState, useMemo, useEffect } from 'react';
+import { useState, useMemo, useEffect, useRef } from 'react';
 import { ScheduleEvent, EventType, Person, BookingRequest } from '../types/schedule';
 import EventCard from '../components/EventCard';
 import EventDialog from '../components/EventDialog';
@@ -41,6 +41,7 @@ const Index = () => {
   const [userManagementOpen, setUserManagementOpen] = useState(false);
   const [bookingDialogOpen, setBookingDialogOpen] = useState(false);
   const [bookingRequests, setBookingRequests] = useState<BookingRequest[]>([]);
+  const archiveLoaded = useRef(false);
   const { toast } = useToast();
   const { theme, toggleTheme } = useTheme();
 
@@ -61,14 +62,18 @@ const Index = () => {
     }
   };
 
-  const loadData = async () => {
+  const loadData = async (withArchive: boolean = archiveLoaded.current) => {
     try {
-      const [eventsData, usersData] = await Promise.all([
+      // Архивная секция запрашивается только после открытия вкладки "Архив"
+      const [eventsData, usersData, archiveData, bookingsData] = await Promise.all([
         api.getEvents(),
         api.getUsers(),
+        withArchive ? api.getEvents('archive') : Promise.resolve({ events: [] }),
+        api.getBookings('all'),
       ]);
 
-      setEvents(eventsData.events || []);
+      setEvents([...(eventsData.events || []), ...(archiveData.events || [])]);
+      setBookingRequests(bookingsData.bookings || []);
       setUsers(usersData.users.map((u: any) => ({
         id: String(u.id),
         name: u.full_name,
@@ -85,6 +90,13 @@ const Index = () => {
     }
   };
 
+  const handleTabChange = async (tab: string) => {
+    if (tab === 'archive' && !archiveLoaded.current) {
+      archiveLoaded.current = true;
+      await loadData(true);
+    }
+  };
+
   const handleLogin = async () => {
     setAuthenticated(true);
     await checkAuth();
@@ -96,6 +108,8 @@ const Index = () => {
     setCurrentUser(null);
     setEvents([]);
     setUsers([]);
+    setBookingRequests([]);
+    archiveLoaded.current = false;
   };
 
   useEffect(() => {
@@ -139,11 +153,15 @@ const Index = () => {
       if (eventsToArchive.length > 0) {
         console.log(`Archiving ${eventsToArchive.length} events`);
         try {
-          for (const event of eventsToArchive) {
-            const updateData = { ...event, status: 'archived' };
-            console.log('Sending update:', updateData);
-            await api.updateEvent(updateData);
-          }
+          await api.batchEvents(
+            eventsToArchive.map((event) => ({
+              op: 'update',
+              id: event.id,
+              data: { status: 'archived' },
+              version: event.version,
+            })),
+            false
+          );
           await loadData();
         } catch (error) {
           console.error('Failed to archive events:', error);
@@ -157,6 +175,57 @@ const Index = () => {
     return () => clearInterval(interval);
   }, [authenticated, events.length]);
 
+  useEffect(() => {
+    if (!authenticated) return;
+
+    // Long-poll изменений: сервер отвечает, как только событие изменено кем-то ещё.
+    // Скрытая вкладка не держит запрос и перечитывает данные при возвращении.
+    // После сброса курсора или ошибки следующий запрос откладывается: 1 с, 2 с, ... до 30 с.
+    let stopped = false;
+    let polling = false;
+    let cursor = '';
+    let backoff = 0;
+
+    const poll = async () => {
+      if (polling) return;
+      polling = true;
+      while (!stopped && !document.hidden) {
+        if (backoff) {
+          await new Promise((resolve) => setTimeout(resolve, backoff));
+          if (stopped) break;
+        }
+        try {
+          const result = await api.waitForChanges(cursor);
+          if (stopped) break;
+          if (cursor && (result.reset || result.ids.length > 0)) {
+            await loadData();
+          }
+          cursor = result.cursor;
+          backoff = result.reset ? Math.min(Math.max(backoff * 2, 1000), 30000) : 0;
+        } catch {
+          backoff = Math.min(Math.max(backoff * 2, 1000), 30000);
+        }
+      }
+      polling = false;
+    };
+
+    const handleVisibilityChange = () => {
+      if (!document.hidden) {
+        cursor = '';
+        loadData();
+        poll();
+      }
+    };
+
+    document.addEventListener('visibilitychange', handleVisibilityChange);
+    poll();
+
+    return () => {
+      stopped = true;
+      document.removeEventListener('visibilitychange', handleVisibilityChange);
+    };
+  }, [authenticated]);
+
   const activeEvents = useMemo(
     () => events.filter((e) => e.status !== 'completed' && e.status !== 'cancelled' && e.status !== 'archived'),
     [events]
@@ -222,7 +291,17 @@ const Index = () => {
       }
 
       if (editingEvent) {
-        await api.updateEvent({ ...editingEvent, ...eventData });
+        // Отправляем только изменённые поля с версией, полученной при загрузке;
+        // пустое значение очищает поле на сервере
+        const changes = Object.fromEntries(
+          Object.entries(eventData)
+            .map(([key, value]) => [key, value === undefined || value === '' ? null : value])
+            .filter(
+              ([key, value]) =>
+                JSON.stringify(value) !== JSON.stringify(editingEvent[key as keyof ScheduleEvent] ?? null)
+            )
+        );
+        await api.patchEvent(editingEvent.id, changes, editingEvent.version);
         toast({
           title: 'Событие обновлено',
           description: 'Изменения успешно сохранены',
@@ -238,6 +317,16 @@ const Index = () => {
       setDialogOpen(false);
       await loadData();
     } catch (error: any) {
+      if (error.message === 'Version conflict') {
+        toast({
+          title: 'Событие уже изменено',
+          description: 'Другой пользователь изменил событие. Данные обновлены, повторите правку',
+          variant: 'destructive',
+        });
+        setDialogOpen(false);
+        await loadData();
+        return;
+      }
       toast({
         title: 'Ошибка',
         description: error.message,
@@ -270,7 +359,7 @@ const Index = () => {
 
   const handleCancel = async (event: ScheduleEvent) => {
     try {
-      await api.updateEvent({ ...event, status: 'cancelled' });
+      await api.patchEvent(event.id, { status: 'cancelled' }, event.version);
       toast({
         title: 'Событие отменено',
         description: 'Статус события изменен на "Отменено"',
@@ -290,38 +379,33 @@ const Index = () => {
     setDialogOpen(true);
   };
 
-  const handleBookingSubmit = (request: BookingRequest) => {
-    setBookingRequests((prev) => [...prev, request]);
-    toast({
-      title: 'Заявка отправлена',
-      description: 'Ваша заявка ожидает подтверждения администратора',
-    });
-  };
-
-  const handleApproveBooking = async (requestId: string) => {
-    const request = bookingRequests.find((r) => r.id === requestId);
-    if (!request) return;
-
+  const handleBookingSubmit = async (request: BookingRequest) => {
     try {
-      const eventData: Partial<ScheduleEvent> = {
+      const booking = await api.submitBooking({
         title: request.title,
-        type: 'meeting',
         date: request.date,
         time: request.time,
         endTime: request.endTime,
         description: request.description,
-        responsible: [request.requestedBy],
-        status: 'scheduled',
-        bookingRequestId: requestId,
-      };
+      });
+      setBookingRequests((prev) => [...prev, booking]);
+      toast({
+        title: 'Заявка отправлена',
+        description: 'Ваша заявка ожидает подтверждения администратора',
+      });
+    } catch (error: any) {
+      toast({
+        title: 'Ошибка',
+        description: error.message === 'Time slot already booked' ? 'Это время уже занято' : error.message,
+        variant: 'destructive',
+      });
+    }
+  };
 
-      await api.createEvent(eventData);
-      
-      setBookingRequests((prev) =>
-        prev.map((r) =>
-          r.id === requestId ? { ...r, status: 'approved', approvedBy: currentUser?.full_name, approvedAt: new Date().toISOString() } : r
-        )
-      );
+  const handleApproveBooking = async (requestId: string) => {
+    try {
+      // Сервер создаёт событие и проверяет пересечение с одобренными заявками в одной транзакции
+      await api.approveBookings([requestId]);
 
       toast({
         title: 'Заявка одобрена',
@@ -332,24 +416,35 @@ const Index = () => {
     } catch (error: any) {
       toast({
         title: 'Ошибка',
-        description: error.message,
+        description: error.message === 'Booking overlaps an approved booking'
+          ? 'Время пересекается с уже одобренной заявкой'
+          : error.message,
         variant: 'destructive',
       });
     }
   };
 
-  const handleRejectBooking = (requestId: string) => {
-    setBookingRequests((prev) =>
-      prev.map((r) =>
-        r.id === requestId ? { ...r, status: 'rejected' } : r
-      )
-    );
+  const handleRejectBooking = async (requestId: string) => {
+    try {
+      await api.rejectBookings([requestId]);
+      setBookingRequests((prev) =>
+        prev.map((r) =>
+          r.id === requestId ? { ...r, status: 'rejected' } : r
+        )
+      );
 
-    toast({
-      title: 'Заявка отклонена',
-      description: 'Бронирование времени отклонено',
-      variant: 'destructive',
-    });
+      toast({
+        title: 'Заявка отклонена',
+        description: 'Бронирование времени отклонено',
+        variant: 'destructive',
+      });
+    } catch (error: any) {
+      toast({
+        title: 'Ошибка',
+        description: error.message,
+        variant: 'destructive',
+      });
+    }
   };
 
   const handleManualArchive = async () => {
@@ -378,9 +473,14 @@ const Index = () => {
     }
 
     try {
-      for (const event of eventsToArchive) {
-        await api.updateEvent({ ...event, status: 'archived' });
-      }
+      await api.batchEvents(
+        eventsToArchive.map((event) => ({
+          op: 'update',
+          id: event.id,
+          data: { status: 'archived' },
+          version: event.version,
+        }))
+      );
       await loadData();
       toast({
         title: 'События архивированы',
@@ -586,7 +686,7 @@ const Index = () => {
           </div>
         </div>
 
-        <Tabs defaultValue="active" className="space-y-6">
+        <Tabs defaultValue="active" onValueChange={handleTabChange} className="space-y-6">
           {canEdit ? (
             <TabsList className="grid w-full max-w-md grid-cols-2 h-11">
               <TabsTrigger value="active" className="text-base font-body">
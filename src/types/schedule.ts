@@ -10,10 +10,11 @@ export interface BookingRequest {
   time: string;
   endTime: string;
   description?: string;
-  status: 'pending' | 'approved' | 'rejected';
+  status: 'pending' | 'approved' | 'rejected' | 'released';
   createdAt: string;
   approvedBy?: string;
   approvedAt?: string;
+  eventId?: string;
 }
 
 export interface Person {
@@ -42,4 +43,5 @@ export interface ScheduleEvent {
   regionName?: string;
   isMultiDay?: boolean;
   bookingRequestId?: string;
+  version?: number;
 }
\ No newline at end of file